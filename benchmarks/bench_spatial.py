@@ -0,0 +1,74 @@
+"""
+Per-tick cost of the movement and trade phases: all pairs, the SpatialGrid
+reference path, and the vectorized Population path.
+
+The world is scaled with the population so agent density stays at the
+default 10 players on an 800x600 screen. All-pairs timings above
+--brute-max players are extrapolated from a sample of outer-loop players,
+since a single all-pairs tick at 100k players takes hours.
+
+    python benchmarks/bench_spatial.py --sizes 10 1000 10000 100000
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from econsim import WIDTH, HEIGHT, NUM_PLAYERS, Simulation
+
+
+def make_simulation(size, vectorized, seed):
+    scale = math.sqrt(size / NUM_PLAYERS)
+    return Simulation(num_players=size, seed=seed, width=int(WIDTH * scale), height=int(HEIGHT * scale),
+                      min_players=0, vectorized=vectorized)
+
+
+def time_grid_tick(simulation, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        simulation.move_players()
+        simulation.trade_players()
+    return (time.perf_counter() - start) / ticks
+
+
+def time_brute_tick(simulation, sample):
+    """Time the all-pairs move and trade loops for `sample` players and scale up to the whole list."""
+    players = simulation.players
+    stride = max(1, len(players) // sample)
+    sampled = range(0, len(players), stride)
+    start = time.perf_counter()
+    for index in sampled:
+        players[index].move(players, simulation.rng, simulation.width, simulation.height)
+    for index in sampled:
+        player = players[index]
+        for other in players[index + 1:]:
+            if player.trade(other):
+                break
+    return (time.perf_counter() - start) * len(players) / len(sampled)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000])
+    parser.add_argument("--ticks", type=int, default=5, help="ticks to average the grid timing over")
+    parser.add_argument("--brute-max", type=int, default=1000, help="largest population timed in full without the grid")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'players':>8} {'all-pairs ms/tick':>18} {'grid ms/tick':>13} {'arrays ms/tick':>15}")
+    for size in args.sizes:
+        brute = make_simulation(size, False, args.seed)
+        brute_time = time_brute_tick(brute, size if size <= args.brute_max else args.brute_max // 10)
+        estimated = "*" if size > args.brute_max else " "
+
+        grid_time = time_grid_tick(make_simulation(size, False, args.seed), args.ticks)
+        array_time = time_grid_tick(make_simulation(size, True, args.seed), args.ticks)
+        print(f"{size:>8} {brute_time * 1000:>17.2f}{estimated} {grid_time * 1000:>13.2f} {array_time * 1000:>15.2f}")
+    print("* extrapolated from a sample of players")
+
+
+if __name__ == "__main__":
+    main()
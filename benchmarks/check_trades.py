@@ -0,0 +1,131 @@
+"""
+Check that the batch trade phase matches the per-player reference exactly.
+
+Builds random populations (crowded, sparse, with empty balances and players
+on cooldown), takes their trade candidates, and trades them once with
+resolve_trades and once on a copy with Player.trade over the same pairs in
+the same order; every column must come out identical. Also times the worst
+case for the matching, a line of overlapping players numbered along it.
+
+Then runs whole simulations on both paths across trade radii and compares
+the trade volume, which catches movement or cooldown bugs the batch check
+cannot see. The paths differ in phase order (see Population.move), so the
+volumes only have to agree within a factor of MAX_VOLUME_RATIO; with a
+trade radius of two player radii or less the vectorized path trades about
+twice as much. Exits non-zero on any mismatch.
+
+    python benchmarks/check_trades.py --populations 40 --radii 10,15,20,30,50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from econsim import Population, Simulation, STRATEGIES, TRADE_RADIUS
+from econsim.trading import resolve_trades
+
+MAX_VOLUME_RATIO = 3  # Largest allowed ratio between the two paths' trade volumes
+
+
+def random_population(rng, size, width, height):
+    population = Population(capacity=size)
+    population.spawn(size, rng, width, height, margin=0)
+    # Small and empty balances exercise the min() clamps and the division by zero
+    population.resource[:] = rng.choice([0, 1, 3, 5, 20, 50], size)
+    population.currency[:] = rng.choice([0, 2, 5, 8, 20, 50], size)
+    population.strategy[:] = rng.integers(0, len(STRATEGIES), size)
+    population.cooldown[:] = np.where(rng.random(size) < 0.3, rng.integers(1, 50, size), 0)
+    population.trade_counter[:] = rng.integers(0, 30, size)
+    return population
+
+
+def copy_of(population):
+    copy = Population(capacity=len(population))
+    copy.restore({name: getattr(population, name).copy() for name in population.FIELDS},
+                 len(population), population.next_id)
+    return copy
+
+
+def compare(population):
+    """Names of the columns where the batch and the sequential trades disagree, and the batch's seconds."""
+    reference = copy_of(population)
+    i, j = population.trade_candidates()
+    start = time.perf_counter()
+    resolve_trades(population, i, j)
+    seconds = time.perf_counter() - start
+    players = reference.players()
+    for a, b in zip(i.tolist(), j.tolist()):
+        players[a].trade(players[b])
+    # The memoized valuations are a cache the scalar path doesn't fill
+    wrong = [name for name in Population.FIELDS if not name.startswith('valu')
+             and not np.array_equal(getattr(population, name), getattr(reference, name))]
+    return wrong, seconds
+
+
+def chain(size):
+    """A line of `size` players, each within trade radius of the next, numbered along it."""
+    population = Population(capacity=size)
+    population.spawn(size, np.random.default_rng(0), size * TRADE_RADIUS, TRADE_RADIUS, margin=0)
+    population.x[:] = np.arange(size) * (TRADE_RADIUS - 1)
+    population.y[:] = 0
+    population.cooldown[:] = 0
+    return population
+
+
+def trade_volume(radius, vectorized, seeds, ticks, players):
+    """Trades made over `seeds` runs of `ticks` ticks, rare events off so both paths see the same economy."""
+    total = 0
+    for seed in range(seeds):
+        simulation = Simulation(num_players=players, seed=seed, trade_radius=radius, vectorized=vectorized,
+                                rare_event_prob={'crash': 0})
+        simulation.run(ticks)
+        total += simulation.total_trades
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--populations", type=int, default=40, help="random populations to compare")
+    parser.add_argument("--chain", type=int, default=20000, help="players in the worst-case line")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--radii", default="10,15,20,30,50", help="trade radii to compare trade volume at")
+    parser.add_argument("--runs", type=int, default=3, help="seeded runs per path and radius")
+    parser.add_argument("--ticks", type=int, default=600, help="ticks per run")
+    parser.add_argument("--players", type=int, default=100, help="players per run")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    failed = 0
+    for case in range(args.populations):
+        size = int(rng.integers(2, 3000))
+        side = int(rng.integers(100, 3000))
+        population = random_population(rng, size, side, side)
+        wrong, _ = compare(population)
+        if wrong:
+            failed += 1
+            print(f"population {case} ({size} players on {side}x{side}): {', '.join(wrong)} differ")
+    print(f"{args.populations - failed}/{args.populations} populations match the sequential trades")
+
+    wrong, seconds = compare(chain(args.chain))
+    if wrong:
+        failed += 1
+        print(f"chain: {', '.join(wrong)} differ")
+    print(f"chain of {args.chain} players traded in {seconds * 1000:.1f} ms")
+
+    for radius in [float(value) for value in args.radii.split(',') if value]:
+        vectorized = trade_volume(radius, True, args.runs, args.ticks, args.players)
+        reference = trade_volume(radius, False, args.runs, args.ticks, args.players)
+        agree = max(vectorized, reference) <= MAX_VOLUME_RATIO * min(vectorized, reference)
+        if not agree:
+            failed += 1
+        print(f"trade radius {radius:g}: {vectorized} trades vectorized, {reference} reference"
+              f"{'' if agree else ' (MISMATCH)'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
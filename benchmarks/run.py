@@ -0,0 +1,190 @@
+"""
+Benchmark suite for the simulation hot paths.
+
+Runs the full tick loop headless with a fixed seed at several population
+sizes, timing every phase of Simulation.step separately (period logging
+goes to a temporary CSV through a DataSink), and writes ticks per second,
+per-tick and per-phase latency percentiles and peak memory to JSON.
+The world grows with the population so agent density stays at the default
+10 players on an 800x600 screen.
+
+    python benchmarks/run.py --out before.json
+    python benchmarks/run.py --out after.json
+    python benchmarks/run.py compare before.json after.json --threshold 0.10
+
+compare exits with status 1 if any size's ticks per second, or any phase's
+median latency, got worse by more than the threshold.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np
+
+from econsim import WIDTH, HEIGHT, NUM_PLAYERS, Simulation, DataSink
+
+PERCENTILES = (50, 90, 99)
+
+
+def make_simulation(size, seed, sink=None, period_ticks=50):
+    scale = math.sqrt(size / NUM_PLAYERS)
+    return Simulation(num_players=size, seed=seed, width=int(WIDTH * scale), height=int(HEIGHT * scale),
+                      period_ticks=period_ticks, sink=sink)
+
+
+def latency(samples):
+    """Latency summary in milliseconds."""
+    samples = np.asarray(samples) * 1000
+    summary = {f"p{percentile}": float(np.percentile(samples, percentile)) for percentile in PERCENTILES}
+    summary["mean"] = float(samples.mean())
+    summary["max"] = float(samples.max())
+    return summary
+
+
+def timed_ticks(simulation, ticks):
+    """Step `ticks` times, timing each phase. Returns per-tick and per-phase durations in seconds."""
+    phases = {phase: getattr(simulation, phase) for phase in simulation.PHASES}
+    phase_times = {phase: [] for phase in phases}
+    tick_times = []
+    clock = time.perf_counter
+    for _ in range(ticks):
+        tick_start = clock()
+        for name, phase in phases.items():
+            start = clock()
+            phase()
+            phase_times[name].append(clock() - start)
+        simulation.tick += 1
+        tick_times.append(clock() - tick_start)
+    return tick_times, phase_times
+
+
+def peak_memory(size, seed, ticks, period_ticks):
+    """Peak traced allocation (bytes) of building a simulation and stepping it, measured in a separate run."""
+    tracemalloc.start()
+    try:
+        simulation = make_simulation(size, seed, period_ticks=period_ticks)
+        simulation.run(ticks)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_size(size, seed, ticks, warmup, period_ticks):
+    with tempfile.TemporaryDirectory() as directory:
+        sink = DataSink(os.path.join(directory, "bench.csv"))
+        simulation = make_simulation(size, seed, sink, period_ticks)
+        simulation.run(warmup)
+        start = time.perf_counter()
+        tick_times, phase_times = timed_ticks(simulation, ticks)
+        elapsed = time.perf_counter() - start
+        simulation.close()
+
+    return {
+        "players_start": size,
+        "players_end": len(simulation.population),
+        "ticks": ticks,
+        "ticks_per_second": ticks / elapsed,
+        "tick_ms": latency(tick_times),
+        "phases_ms": {phase: latency(samples) for phase, samples in phase_times.items()},
+        "peak_traced_bytes": peak_memory(size, seed, min(ticks, 20), period_ticks),
+    }
+
+
+def run(args):
+    report = {
+        "meta": {
+            "seed": args.seed,
+            "ticks": args.ticks,
+            "warmup": args.warmup,
+            "period_ticks": args.period_ticks,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        ticks = max(5, min(args.ticks, args.ticks * 1000 // size)) if args.scale_ticks else args.ticks
+        result = bench_size(size, args.seed, ticks, args.warmup, args.period_ticks)
+        report["results"][str(size)] = result
+        phases = ", ".join(f"{phase} {stats['p50']:.2f}" for phase, stats in result["phases_ms"].items())
+        print(f"{size:>7} players: {result['ticks_per_second']:10.1f} ticks/s, "
+              f"tick p50 {result['tick_ms']['p50']:.2f} ms p99 {result['tick_ms']['p99']:.2f} ms, "
+              f"peak {result['peak_traced_bytes'] / 2 ** 20:.1f} MiB")
+        print(f"         phase p50 ms: {phases}")
+
+    # Whole-process high-water mark (kilobytes on Linux)
+    report["meta"]["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Wrote {args.out}")
+
+
+def compare(args):
+    with open(args.before) as file:
+        before = json.load(file)["results"]
+    with open(args.after) as file:
+        after = json.load(file)["results"]
+
+    regressions = []
+    for size in sorted(set(before) & set(after), key=int):
+        old, new = before[size], after[size]
+        change = new["ticks_per_second"] / old["ticks_per_second"] - 1
+        print(f"{size:>7} players: {old['ticks_per_second']:10.1f} -> {new['ticks_per_second']:10.1f} ticks/s "
+              f"({change:+.1%})")
+        if change < -args.threshold:
+            regressions.append(f"{size} players: ticks/s {change:+.1%}")
+        for phase in old["phases_ms"]:
+            if phase not in new["phases_ms"]:
+                continue
+            old_ms, new_ms = old["phases_ms"][phase]["p50"], new["phases_ms"][phase]["p50"]
+            # Sub-microsecond medians are timer noise
+            if old_ms > 0.001 and new_ms / old_ms - 1 > args.threshold:
+                regressions.append(f"{size} players: {phase} p50 {old_ms:.3f} -> {new_ms:.3f} ms")
+
+    if regressions:
+        print("Regressions beyond the threshold:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regressions beyond the threshold.")
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compare"]:
+        parser = argparse.ArgumentParser(prog="run.py compare", description="Compare two benchmark reports.")
+        parser.add_argument("before")
+        parser.add_argument("after")
+        parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown (fraction)")
+        return compare(parser.parse_args(argv[1:]))
+
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000])
+    parser.add_argument("--ticks", type=int, default=500, help="timed ticks per size")
+    parser.add_argument("--no-scale-ticks", dest="scale_ticks", action="store_false",
+                        help="time --ticks ticks at every size instead of fewer at large sizes")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--period-ticks", type=int, default=50,
+                        help="ticks per time period, so logging and settlement show up in short runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="JSON report to write")
+    run(parser.parse_args(argv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
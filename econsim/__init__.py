@@ -0,0 +1,21 @@
+"""Headless core of the trade economy simulation."""
+
+from .model import (
+    WIDTH, HEIGHT, WHITE, BLACK, STRATEGIES, STRATEGY_COLORS, TRADE_RADIUS, TRADE_AMOUNT,
+    NUM_PLAYERS, MIN_PLAYERS, FRAME_DELAY, PERIOD_SECONDS, PERIOD_TICKS, RARE_EVENT_PROB, RARE_EVENT_TYPES,
+    RARE_EVENT_REDUCTIONS, headers, Firm, simulation_step, redistribute_resources, rare_event_chain,
+    rare_event, sample_rare_event, clear_csv_on_exit, save_to_csv,
+)
+from .utility import Utility, UTILITIES, register_utility, ces_utility, leontief_utility, set_strategy_rule
+from .population import Population, Player
+from .simulation import Simulation
+from .sink import RowSink, DataSink, ColumnarSink, load_columnar
+from .writer import AsyncSink
+from .ensemble import Ensemble
+from .ledger import Ledger
+from .profiling import PhaseProfiler
+from .checkpoint import Checkpointer, save_checkpoint, load_checkpoint
+from .events import EventLog, Replay, EVENT_DTYPE, EVENT_KINDS
+from .aggregates import RunningTotals
+from .analytics import Analytics
+from .sharded import ShardedSimulation
@@ -0,0 +1,107 @@
+import argparse
+import logging
+import os
+import time
+
+from .analytics import Analytics
+from .checkpoint import STATE_FILE, Checkpointer, load_checkpoint
+from .profiling import PhaseProfiler
+from .events import EventLog
+from .model import PERIOD_TICKS, WIDTH, HEIGHT
+from .sharded import ShardedSimulation
+from .simulation import Simulation
+from .sink import DataSink, ColumnarSink
+from .writer import AsyncSink, POLICIES
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the trade simulation without a display.")
+    parser.add_argument("--ticks", type=int, default=2500, help="number of ticks to simulate")
+    parser.add_argument("--players", type=int, default=None, help="initial number of players")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--width", type=int, default=WIDTH, help="world width")
+    parser.add_argument("--height", type=int, default=HEIGHT, help="world height")
+    parser.add_argument("--tiles", default=None, metavar="COLSxROWS",
+                        help="split the world into tiles run by one worker process each, e.g. 4x2")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--csv", default=None, help="CSV file to log each time period to")
+    output.add_argument("--columnar", default=None, metavar="DIR",
+                        help="directory to log each time period to as .npy column chunks")
+    parser.add_argument("--background", choices=POLICIES, default=None, metavar="POLICY",
+                        help="write the log on a background thread with this backpressure policy "
+                             f"({', '.join(POLICIES)})")
+    parser.add_argument("--profile", default=None, metavar="FILE",
+                        help="append rolling per-phase timings to FILE as JSON lines")
+    parser.add_argument("--analytics", default=None, metavar="FILE",
+                        help="append wealth, inequality and strategy statistics to FILE as JSON lines every period")
+    parser.add_argument("--events", default=None, metavar="DIR",
+                        help="record every trade, investment, rare event and slash to a binary event log in DIR")
+    parser.add_argument("--checkpoint-dir", default=None, metavar="DIR",
+                        help="save a checkpoint of the whole simulation into DIR every --checkpoint-every ticks")
+    parser.add_argument("--checkpoint-every", type=int, default=PERIOD_TICKS * 10, metavar="TICKS")
+    parser.add_argument("--resume", default=None, metavar="PATH",
+                        help="continue from a checkpoint, or from the newest one in a --checkpoint-dir; "
+                             "--ticks more ticks are run and the log, cut back to the checkpoint, is appended to")
+    args = parser.parse_args(argv)
+    kwargs = {} if args.players is None else {"num_players": args.players}
+
+    if args.tiles:
+        cols, _, rows = args.tiles.partition('x')
+        if not (cols.isdigit() and rows.isdigit()):
+            parser.error(f"--tiles expects COLSxROWS, e.g. 4x2, not {args.tiles!r}")
+        if any((args.csv, args.columnar, args.profile, args.analytics, args.events, args.checkpoint_dir, args.resume)):
+            parser.error("--tiles runs without logging, profiling, analytics, event logs or checkpoints")
+        start = time.perf_counter()
+        try:
+            simulation = ShardedSimulation(seed=args.seed, width=args.width, height=args.height,
+                                           tiles=(int(cols), int(rows)), **kwargs)
+        except ValueError as error:
+            parser.error(str(error))
+        with simulation:
+            simulation.run(args.ticks)
+        logging.info(f"{args.ticks} ticks ({simulation.elapsed_time} periods) on {args.tiles} tiles in "
+                     f"{time.perf_counter() - start:.2f}s, {len(simulation)} players, "
+                     f"{simulation.total_trades} trades, {simulation.rare_event_total} rare events.")
+        return
+
+    sink = None
+    if args.csv:
+        sink = DataSink(args.csv, mode='a' if args.resume else 'w')
+    elif args.columnar:
+        sink = ColumnarSink(args.columnar)
+    if sink is not None and args.background:
+        sink = AsyncSink(sink, policy=args.background)
+
+    profiler = PhaseProfiler(output=args.profile) if args.profile else None
+    checkpointer = Checkpointer(args.checkpoint_dir, every=args.checkpoint_every) if args.checkpoint_dir else None
+    if args.resume:
+        path = args.resume
+        if not os.path.exists(os.path.join(path, STATE_FILE)):
+            path = Checkpointer(path).latest() if os.path.isdir(path) else None
+            if path is None:
+                parser.error(f"no checkpoint found in {args.resume}")
+        if args.events or args.analytics:
+            parser.error("--events and --analytics cannot be combined with --resume")
+        try:
+            simulation = load_checkpoint(path, sink=sink, profiler=profiler, checkpointer=checkpointer)
+        except ValueError as error:
+            parser.error(str(error))
+        logging.info(f"Resuming from {path} at tick {simulation.tick}.")
+    else:
+        events = EventLog(args.events) if args.events else None
+        analytics = Analytics(output=args.analytics) if args.analytics else None
+        simulation = Simulation(seed=args.seed, width=args.width, height=args.height, sink=sink, profiler=profiler,
+                                checkpointer=checkpointer, events=events, analytics=analytics, **kwargs)
+
+    start = time.perf_counter()
+    simulation.run(args.ticks)
+    simulation.close()
+    elapsed = time.perf_counter() - start
+    logging.info(f"{args.ticks} ticks ({simulation.elapsed_time} periods) in {elapsed:.2f}s, "
+                 f"{len(simulation.players)} players, {simulation.trade_total()} trades, "
+                 f"{simulation.rare_event_total} rare events.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,122 @@
+import numpy as np
+
+from .model import STRATEGIES
+
+# Relative slack on the monopoly check, well above the rounding the running
+# totals can pick up between rebuilds
+MONOPOLY_MARGIN = 1e-9
+
+
+class RunningTotals:
+    """
+    Per-strategy totals of resources, currency, trades and players, kept up
+    to date by the simulation phases that change them instead of recomputed
+    from the population arrays every tick.
+
+    Trades only move balances between players, so they update the totals
+    from the traded amounts alone; so do strategy changes, slashes, spawns
+    and removals. Investments and returns update them from the per-player
+    amounts the ledger returns, and rare events, which rescale everyone,
+    rebuild them. `max_wealth` is an upper bound on the richest player's
+    resources plus currency, tightened by richest(); a player can only hold
+    more than everyone else combined if it exceeds half of the total, which
+    is what monopoly_possible() checks in O(1) for the common case.
+    """
+
+    def __init__(self, population):
+        self.rebuild(population)
+
+    def rebuild(self, population):
+        """Recompute every total from the population arrays."""
+        strategy = population.strategy
+        count = len(STRATEGIES)
+        # (bincount gives integers when there are no players at all)
+        self.resource = np.bincount(strategy, weights=population.resource, minlength=count).astype(np.float64)
+        self.currency = np.bincount(strategy, weights=population.currency, minlength=count).astype(np.float64)
+        self.trades = np.bincount(strategy, weights=population.trade_counter, minlength=count).astype(np.int64)
+        self.players = np.bincount(strategy, minlength=count)
+        self.max_wealth = float((population.resource + population.currency).max()) if len(population) else 0.0
+
+    @property
+    def total_resource(self):
+        return float(self.resource.sum())
+
+    @property
+    def total_currency(self):
+        return float(self.currency.sum())
+
+    @property
+    def total_trades(self):
+        """Number of trades made by the players currently in the market."""
+        return int(self.trades.sum())
+
+    def richest(self, population):
+        """Index of the player with the most resources plus currency (None if there are no players)."""
+        if len(population) == 0:
+            self.max_wealth = 0.0
+            return None
+        wealth = population.resource + population.currency
+        index = int(wealth.argmax())
+        self.max_wealth = float(wealth[index])
+        return index
+
+    def monopoly_possible(self, population):
+        """
+        False if no player can hold more than all the others combined, without
+        looking at the population unless the bound on the richest player
+        comes within MONOPOLY_MARGIN of half of the total.
+        """
+        half = (self.total_resource + self.total_currency) / 2 * (1 - MONOPOLY_MARGIN)
+        if self.max_wealth <= half:
+            return False
+        self.richest(population)
+        return self.max_wealth > half
+
+    def _add(self, strategy, resource=None, currency=None, trades=None, players=None):
+        count = len(STRATEGIES)
+        if resource is not None:
+            self.resource += np.bincount(strategy, weights=resource, minlength=count)
+        if currency is not None:
+            self.currency += np.bincount(strategy, weights=currency, minlength=count)
+        if trades is not None:
+            self.trades += np.bincount(strategy, weights=trades, minlength=count).astype(np.int64)
+        if players is not None:
+            self.players += players * np.bincount(strategy, minlength=count)
+
+    def _raise_bound(self, population, index):
+        if len(index):
+            self.max_wealth = max(self.max_wealth, float((population.resource[index] + population.currency[index]).max()))
+
+    def spawned(self, population, index):
+        strategy = population.strategy[index]
+        self._add(strategy, population.resource[index], population.currency[index],
+                  population.trade_counter[index], players=1)
+        self._raise_bound(population, index)
+
+    def traded(self, population, i, j, resource_delta, currency_delta):
+        """After resolve_trades, before the traders adjust their strategies."""
+        self._add(population.strategy[i], -resource_delta, -currency_delta, np.ones(len(i)))
+        self._add(population.strategy[j], resource_delta, currency_delta, np.ones(len(j)))
+        self._raise_bound(population, i)
+        self._raise_bound(population, j)
+
+    def restrategized(self, population, index, previous):
+        """Players in `index` moved from strategies `previous` to their current ones."""
+        resource, currency = population.resource[index], population.currency[index]
+        trades = population.trade_counter[index]
+        self._add(previous, -resource, -currency, -trades, players=-1)
+        self._add(population.strategy[index], resource, currency, trades, players=1)
+
+    def settled(self, population, invested, returns):
+        self._add(population.strategy, -invested, returns)
+        # Returns can outgrow the investment at rates above 1, and this is a full pass anyway
+        self.richest(population)
+
+    def slashed(self, population, index, resource_before, currency_before):
+        self._add(population.strategy[index], population.resource[index] - resource_before,
+                  population.currency[index] - currency_before)
+
+    def removing(self, population, index):
+        """Before the players in `index` leave the market."""
+        self._add(population.strategy[index], -population.resource[index], -population.currency[index],
+                  -population.trade_counter[index], players=-1)
@@ -0,0 +1,163 @@
+import json
+import time
+
+import numpy as np
+
+from .model import PERIOD_TICKS, STRATEGIES
+
+
+def _batch_moments(strategy, values):
+    # Count, mean and sum of squared deviations of `values` per strategy
+    count = np.bincount(strategy, minlength=len(STRATEGIES))
+    mean = np.bincount(strategy, weights=values, minlength=len(STRATEGIES)) / np.maximum(count, 1)
+    m2 = np.bincount(strategy, weights=(values - mean[strategy]) ** 2, minlength=len(STRATEGIES))
+    return count, mean, m2
+
+
+class Analytics:
+    """
+    Streaming statistics of the players' wealth (resources plus currency),
+    fed by the simulation phases as balances change.
+
+    Keeps, per strategy, Welford's running count, mean and sum of squared
+    deviations, merged and unmerged a batch of players at a time (Chan et
+    al.); a histogram of wealth in logarithmic buckets (`bins_per_octave`
+    per doubling, bucket 0 below 1) with the wealth held in each bucket, from
+    which gini() is computed in O(buckets); the strategy transitions made
+    after trading; and the returns paid by the firms per strategy.
+
+    The wealth and strategy each player was last counted with are mirrored
+    in index order, so a change is unmerged with exactly the values it was
+    merged with. A tick costs time proportional to the players who traded
+    or were slashed; investments and rare events touch every player and
+    rebuild everything, which also clears rounding drift once a period.
+
+    If `output` is a path, one JSON line with summary() is appended to it
+    every `report_every` ticks.
+    """
+
+    def __init__(self, population=None, bins_per_octave=16, octaves=48, output=None, report_every=PERIOD_TICKS):
+        self.bins_per_octave = bins_per_octave
+        self.bins = 1 + bins_per_octave * octaves
+        self.report_every = report_every
+        self.transitions = np.zeros((len(STRATEGIES), len(STRATEGIES)), dtype=np.int64)
+        self.profit = np.zeros(len(STRATEGIES))
+        self.file = open(output, 'a', buffering=1) if output else None
+        self.rebuild(population)
+
+    @property
+    def edges(self):
+        """Lower wealth bound of every histogram bucket."""
+        return np.r_[0.0, 2.0 ** (np.arange(self.bins - 1) / self.bins_per_octave)]
+
+    def buckets(self, wealth):
+        index = np.zeros(len(wealth), dtype=np.intp)
+        rich = wealth >= 1
+        index[rich] = np.minimum(np.floor(np.log2(wealth[rich]) * self.bins_per_octave).astype(np.intp) + 1,
+                                 self.bins - 1)
+        return index
+
+    def rebuild(self, population):
+        """Recount every player (transitions and profit are cumulative and kept)."""
+        self.count = np.zeros(len(STRATEGIES), dtype=np.int64)
+        self.mean = np.zeros(len(STRATEGIES))
+        self.m2 = np.zeros(len(STRATEGIES))
+        self.histogram = np.zeros(self.bins, dtype=np.int64)
+        self.bucket_wealth = np.zeros(self.bins)
+        self.wealth = np.empty(0)
+        self.strategy = np.empty(0, dtype=np.int8)
+        if population is not None and len(population):
+            self.spawned(population, np.arange(len(population)))
+
+    def _merge(self, strategy, wealth, sign):
+        # Add (sign 1) or take out (sign -1) a batch of players
+        count, mean, m2 = _batch_moments(strategy, wealth)
+        total = self.count + sign * count
+        safe = np.maximum(total, 1)
+        if sign > 0:
+            delta = mean - self.mean
+            self.mean = self.mean + delta * count / safe
+            self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / safe
+        else:
+            rest_mean = (self.count * self.mean - count * mean) / safe
+            delta = mean - rest_mean
+            self.m2 = self.m2 - m2 - delta ** 2 * total * count / np.maximum(self.count, 1)
+            self.mean = rest_mean
+        empty = total == 0
+        self.mean[empty] = 0
+        self.m2[empty] = 0
+        self.m2 = np.maximum(self.m2, 0)
+        self.count = total
+
+        buckets = self.buckets(wealth)
+        self.histogram += sign * np.bincount(buckets, minlength=self.bins)
+        self.bucket_wealth += sign * np.bincount(buckets, weights=wealth, minlength=self.bins)
+
+    def spawned(self, population, index):
+        wealth = population.resource[index] + population.currency[index]
+        strategy = population.strategy[index]
+        self._merge(strategy, wealth, 1)
+        self.wealth = np.concatenate((self.wealth, wealth))
+        self.strategy = np.concatenate((self.strategy, strategy))
+
+    def changed(self, population, index):
+        """The balances or strategies of the players in `index` changed."""
+        if len(index) == 0:
+            return
+        wealth = population.resource[index] + population.currency[index]
+        strategy = population.strategy[index]
+        previous = self.strategy[index]
+        self._merge(previous, self.wealth[index], -1)
+        self._merge(strategy, wealth, 1)
+        moved = previous != strategy
+        np.add.at(self.transitions, (previous[moved], strategy[moved]), 1)
+        self.wealth[index] = wealth
+        self.strategy[index] = strategy
+
+    def settled(self, population, returns):
+        self.profit += np.bincount(population.strategy, weights=returns, minlength=len(STRATEGIES))
+        self.rebuild(population)
+
+    def removing(self, population, index):
+        """Before the players in `index` leave the market."""
+        self._merge(self.strategy[index], self.wealth[index], -1)
+        self.wealth = np.delete(self.wealth, index)
+        self.strategy = np.delete(self.strategy, index)
+
+    def variance(self):
+        """Population variance of wealth per strategy."""
+        return self.m2 / np.maximum(self.count, 1)
+
+    def gini(self):
+        """Gini coefficient of wealth, treating the players in one bucket as equally rich."""
+        players = self.histogram.sum()
+        total = self.bucket_wealth.sum()
+        if players == 0 or total <= 0:
+            return 0.0
+        lorenz = np.cumsum(self.bucket_wealth) / total
+        previous = np.r_[0.0, lorenz[:-1]]
+        return float(1 - (self.histogram / players * (previous + lorenz)).sum())
+
+    def summary(self):
+        std = np.sqrt(self.variance())
+        used = np.flatnonzero(self.histogram)
+        return {
+            "players": int(self.count.sum()),
+            "gini": self.gini(),
+            "strategies": {name: {"players": int(self.count[code]), "mean": float(self.mean[code]),
+                                  "std": float(std[code]), "profit": float(self.profit[code])}
+                           for code, name in enumerate(STRATEGIES)},
+            # Non-empty buckets only, as [lower bound, players]
+            "histogram": [[float(self.edges[bucket]), int(self.histogram[bucket])] for bucket in used],
+            "transitions": self.transitions.tolist(),
+        }
+
+    def end_tick(self, simulation):
+        """Called once per tick; writes the periodic report."""
+        if self.file is not None and simulation.tick % self.report_every == 0:
+            self.file.write(json.dumps({"tick": simulation.tick, "time": time.time(), **self.summary()}) + "\n")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
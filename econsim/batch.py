@@ -0,0 +1,171 @@
+"""
+Parameter sweeps: run the headless simulation for every combination of a
+parameter grid and a number of seeds across a process pool, streaming one
+summary row per run into a CSV results table.
+
+    python -m econsim.batch --grid trade_radius=30,50,70 --grid crash=0.05,0.1 \\
+        --seeds 20 --ticks 2500 --out sweep.csv
+"""
+import argparse
+import csv
+import itertools
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .model import STRATEGIES, RARE_EVENT_PROB, TRADE_RADIUS, TRADE_AMOUNT, NUM_PLAYERS
+from .simulation import Simulation
+
+# Sweepable parameters and their defaults; the RARE_EVENT_PROB keys set one
+# link of the rare event chain.
+PARAMETERS = dict(
+    {'num_players': NUM_PLAYERS, 'trade_radius': TRADE_RADIUS, 'trade_amount': TRADE_AMOUNT,
+     'interest_rate': 0.05},
+    **RARE_EVENT_PROB,
+)
+_INTEGER_PARAMETERS = {'num_players'}
+_POSITIVE_PARAMETERS = {'trade_radius', 'trade_amount'}
+
+SUMMARY_FIELDS = ['players', 'total_resource', 'total_currency', 'mean_wealth', 'wealth_gini',
+                  'total_trades', 'rare_events'] + [f"share_{strategy}" for strategy in STRATEGIES] + ['seconds']
+
+
+def check_grid(grid):
+    """Raise ValueError for a value no run could use: a radius or amount that isn't positive, or fewer than 0 players."""
+    for name, values in grid.items():
+        if name not in PARAMETERS:
+            raise ValueError(f"Unknown parameter {name!r}; expected one of {sorted(PARAMETERS)}")
+        for value in values:
+            if name in _POSITIVE_PARAMETERS and not value > 0:
+                raise ValueError(f"{name} must be positive, got {value}")
+            if name == 'num_players' and value < 0:
+                raise ValueError(f"num_players must not be negative, got {value}")
+
+
+def parse_grid(specs):
+    """Turn ['name=v1,v2', ...] into {name: [v1, v2], ...}."""
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        name = name.strip()
+        if name not in PARAMETERS or not values:
+            raise ValueError(f"Bad grid entry {spec!r}; expected name=v1,v2,... with name one of {sorted(PARAMETERS)}")
+        convert = int if name in _INTEGER_PARAMETERS else float
+        grid[name] = [convert(value) for value in values.split(',')]
+    check_grid(grid)
+    return grid
+
+
+def expand(grid, seeds, first_seed=0):
+    """Every (parameters, seed) combination of the grid, parameters varying slowest."""
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        for seed in range(first_seed, first_seed + seeds):
+            yield dict(zip(names, values)), seed
+
+
+def gini(values):
+    """Gini coefficient of non-negative values (0 = equal, 1 = one holder)."""
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    total = values.sum()
+    if len(values) == 0 or total == 0:
+        return 0.0
+    ranks = np.arange(1, len(values) + 1)
+    return float((2 * (ranks * values).sum()) / (len(values) * total) - (len(values) + 1) / len(values))
+
+
+def summarize(simulation):
+    """Summary statistics of a finished run."""
+    population = simulation.population
+    wealth = population.resource + population.currency
+    counts = np.bincount(population.strategy, minlength=len(STRATEGIES))
+    summary = {
+        'players': len(population),
+        'total_resource': float(population.resource.sum()),
+        'total_currency': float(population.currency.sum()),
+        'mean_wealth': float(wealth.mean()) if len(wealth) else 0.0,
+        'wealth_gini': gini(wealth),
+        'total_trades': simulation.total_trades,
+        'rare_events': simulation.rare_event_total,
+    }
+    for strategy, count in zip(STRATEGIES, counts):
+        summary[f"share_{strategy}"] = count / max(1, len(population))
+    return summary
+
+
+def run_one(task):
+    """Run one simulation to completion; `task` is (parameters, seed, ticks)."""
+    parameters, seed, ticks = task
+    parameters = dict(PARAMETERS, **parameters)
+    rare_event_prob = {name: parameters[name] for name in RARE_EVENT_PROB}
+
+    start = time.perf_counter()
+    simulation = Simulation(num_players=parameters['num_players'], seed=seed,
+                            trade_radius=parameters['trade_radius'], trade_amount=parameters['trade_amount'],
+                            interest_rate=parameters['interest_rate'], rare_event_prob=rare_event_prob)
+    simulation.run(ticks)
+    summary = summarize(simulation)
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def _quiet_worker():
+    # Per-event log lines from thousands of runs would drown the progress output
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def run_batch(grid, seeds, ticks, out, workers=None, first_seed=0, chunksize=None):
+    """
+    Run every combination in `grid` for `seeds` seeds and write one row per
+    run to the file object `out` as it completes (in grid order). Returns
+    the number of runs.
+    """
+    check_grid(grid)
+    tasks = [(parameters, seed, ticks) for parameters, seed in expand(grid, seeds, first_seed)]
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, len(tasks) // (workers * 8))
+
+    writer = csv.DictWriter(out, fieldnames=list(grid) + ['seed'] + SUMMARY_FIELDS)
+    writer.writeheader()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_quiet_worker) as executor:
+        for done, ((parameters, seed, _), summary) in enumerate(
+                zip(tasks, executor.map(run_one, tasks, chunksize=chunksize)), start=1):
+            writer.writerow(dict(parameters, seed=seed, **summary))
+            out.flush()
+            if done % max(1, len(tasks) // 20) == 0:
+                logging.info(f"{done}/{len(tasks)} runs done.")
+    return len(tasks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep simulation parameters across all cores.")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help=f"parameter values to sweep (repeatable); names: {', '.join(PARAMETERS)}")
+    parser.add_argument("--seeds", type=int, default=10, help="runs per parameter combination")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--ticks", type=int, default=2500, help="ticks per run")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--out", default="-", help="results CSV (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        grid = parse_grid(args.grid)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    if args.out == "-":
+        runs = run_batch(grid, args.seeds, args.ticks, sys.stdout, args.workers, args.first_seed)
+    else:
+        with open(args.out, 'w', newline='') as out:
+            runs = run_batch(grid, args.seeds, args.ticks, out, args.workers, args.first_seed)
+    logging.info(f"{runs} runs in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
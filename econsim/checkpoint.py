@@ -0,0 +1,161 @@
+"""
+Checkpoint and restore of the full simulation state.
+
+A checkpoint is a directory holding one .npy file per Population column and
+a small state.json with everything else: tick and period counters, trade
+and rare event totals, parameters, firms (rates, reserves, outstanding
+investments), the state of both random generators and where the log
+ended. Columns are written through memory maps and read back
+memory-mapped, so saving or loading a large economy costs about one copy
+of its arrays. A simulation restored
+with load_checkpoint continues bit for bit as the original would have.
+"""
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+
+from .model import Firm, PERIOD_TICKS
+from .simulation import Simulation
+
+STATE_FILE = "state.json"
+FORMAT_VERSION = 1
+
+
+def save_checkpoint(simulation, path):
+    """Write `simulation`'s state to the directory `path`, replacing any checkpoint already there."""
+    population = simulation.population
+    # Where the log ends at this tick, so a resumed run can drop what was logged after it
+    log_position = simulation.sink.position() if simulation.sink is not None else None
+
+    staging = f"{path}.partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name in population.FIELDS:
+        column = getattr(population, name)
+        stored = np.lib.format.open_memmap(os.path.join(staging, f"{name}.npy"), mode='w+',
+                                           dtype=column.dtype, shape=column.shape)
+        stored[:] = column
+        stored.flush()
+        del stored
+
+    state = {
+        "version": FORMAT_VERSION,
+        "tick": simulation.tick,
+        "last_logged_time": simulation.last_logged_time,
+        "last_profit_time": simulation.last_profit_time,
+        "total_trades": simulation.total_trades,
+        "rare_event_total": simulation.rare_event_total,
+        "log_position": log_position,
+        "parameters": {
+            "width": simulation.width,
+            "height": simulation.height,
+            "period_ticks": simulation.period_ticks,
+            "min_players": simulation.min_players,
+            "vectorized": simulation.vectorized,
+            "spatial_index": simulation.spatial_index,
+            "trade_radius": population.trade_radius,
+            "trade_amount": population.trade_amount,
+            "rare_event_prob": simulation.rare_event_prob,
+        },
+        "population": {"size": len(population), "next_id": population.next_id, "radius": population.radius},
+        "firms": [{"interest_rate": firm.interest_rate, "currency_reserves": float(firm.currency_reserves),
+                   "investments": [[int(player_id), float(amount)] for player_id, amount in firm.investments.items()]}
+                  for firm in simulation.firms],
+        "rng": list(simulation.rng.getstate()),
+        "np_rng": simulation.np_rng.bit_generator.state,
+    }
+    with open(os.path.join(staging, STATE_FILE), "w") as file:
+        json.dump(state, file)
+
+    # Swap the finished checkpoint in, so a crash mid-save never leaves a half-written one at `path`
+    if os.path.exists(path):
+        retired = f"{path}.old"
+        shutil.rmtree(retired, ignore_errors=True)
+        os.replace(path, retired)
+        os.replace(staging, path)
+        shutil.rmtree(retired)
+    else:
+        os.replace(staging, path)
+
+
+def load_checkpoint(path, sink=None, profiler=None, checkpointer=None):
+    """
+    Rebuild the Simulation saved in the directory `path`.
+
+    `sink`, if given, should be the log the original run wrote to, opened
+    for appending: it is rewound to where it ended when the checkpoint was
+    saved, so the rows logged between the checkpoint and a crash are not
+    written twice.
+    """
+    with open(os.path.join(path, STATE_FILE)) as file:
+        state = json.load(file)
+    if state.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported checkpoint format {state.get('version')!r} in {path}")
+    if sink is not None:
+        if state.get("log_position") is not None:
+            sink.rewind(state["log_position"])
+        else:
+            logging.warning(f"The checkpoint in {path} does not record where its log ended; "
+                            f"rows logged after it may appear twice.")
+
+    parameters = state["parameters"]
+    firms = []
+    for saved in state["firms"]:
+        firm = Firm(saved["interest_rate"])
+        firm.currency_reserves = saved["currency_reserves"]
+        firm.investments = {player_id: amount for player_id, amount in saved["investments"]}
+        firms.append(firm)
+
+    simulation = Simulation(num_players=0, firms=firms, sink=sink, profiler=profiler,
+                            checkpointer=checkpointer, **parameters)
+    # Columns added since the checkpoint was written start from Population.DEFAULTS
+    columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+               for name in simulation.population.FIELDS if os.path.exists(os.path.join(path, f"{name}.npy"))}
+    simulation.population.radius = state["population"]["radius"]
+    simulation.population.restore(columns, state["population"]["size"], state["population"]["next_id"])
+    if simulation.totals is not None:
+        simulation.totals.rebuild(simulation.population)
+
+    simulation.tick = state["tick"]
+    simulation.last_logged_time = state["last_logged_time"]
+    simulation.last_profit_time = state["last_profit_time"]
+    simulation.total_trades = state["total_trades"]
+    simulation.rare_event_total = state["rare_event_total"]
+    version, internal, gauss = state["rng"]
+    simulation.rng.setstate((version, tuple(internal), gauss))
+    simulation.np_rng.bit_generator.state = state["np_rng"]
+    return simulation
+
+
+class Checkpointer:
+    """
+    Saves a checkpoint every `every` ticks into `directory`/tick_<tick>,
+    keeping the newest `keep` of them. Attach it with
+    Simulation(checkpointer=...); resume with load_checkpoint(latest()).
+    """
+
+    def __init__(self, directory, every=PERIOD_TICKS, keep=2):
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def after_tick(self, simulation):
+        if simulation.tick % self.every == 0:
+            save_checkpoint(simulation, os.path.join(self.directory, f"tick_{simulation.tick:012d}"))
+            for old in self.checkpoints()[:-self.keep]:
+                shutil.rmtree(old)
+
+    def checkpoints(self):
+        """Complete checkpoints, oldest first."""
+        return [os.path.join(self.directory, entry) for entry in sorted(os.listdir(self.directory))
+                if entry.startswith("tick_") and "." not in entry
+                and os.path.exists(os.path.join(self.directory, entry, STATE_FILE))]
+
+    def latest(self):
+        """Path of the newest complete checkpoint, or None."""
+        checkpoints = self.checkpoints()
+        return checkpoints[-1] if checkpoints else None
@@ -0,0 +1,199 @@
+import numpy as np
+
+from .model import RARE_EVENT_PROB, RARE_EVENT_TYPES, rare_event_chain
+from .simulation import Simulation
+
+
+class Ensemble:
+    """
+    K economies stepped together, with their rare event and redistribution
+    phases batched.
+
+    Balances and rare event state are (K, N) arrays, one row per economy.
+    Every tick the rare event chain is sampled for all K economies at once
+    and the cumulative reductions and the anti-monopoly slash are applied
+    with masked array operations, so the rare event and redistribution
+    phases of a thousand economies cost about as much as a few array passes.
+
+    Built with from_simulations() (or create()), the rows are real
+    economies: each Simulation runs its own phases (settling, moving,
+    trading, removal and respawning) as in Simulation.step, and its
+    balances are stacked into the arrays, padded with empty balances to the
+    largest economy, for the two batched phases and written back after
+    them. Built directly, with a number of economies and players, it is a
+    bare model of balances alone: players keep their 20-50 starting
+    endowments, and never move, trade, invest, leave or respawn, so nobody
+    grows rich enough to be slashed and event_frequencies() only measures
+    the chain probabilities.
+    """
+
+    def __init__(self, economies, num_players, seed=None, rare_event_prob=None):
+        self.rng = np.random.default_rng(seed)
+        self.rare_event_prob = dict(RARE_EVENT_PROB, **(rare_event_prob or {}))
+        chain = rare_event_chain(self.rare_event_prob)
+        self.chain_prob = np.array([prob for _, prob, _ in chain])
+        # Cumulative reduction after reaching each link, summed in chain order
+        # like the scalar loop does: [0, 0.15, 0.25, 0.30, 0.50]
+        self.chain_reduction = np.concatenate(([0.0], np.cumsum([reduction for _, _, reduction in chain])))
+
+        shape = (economies, num_players)
+        self.resource = self.rng.integers(20, 51, shape).astype(np.float64)
+        self.currency = self.rng.integers(20, 51, shape).astype(np.float64)
+        self.rare_event_type = np.zeros(shape, dtype=np.int8)  # 0 = none, i + 1 = RARE_EVENT_TYPES[i]
+        self.rare_event_counter = np.zeros(shape, dtype=np.int32)
+        self.rare_event_total = np.zeros(economies, dtype=np.int64)
+        # How often each economy's chain ended at each link (column 0: crash check passed, chain stopped)
+        self.event_counts = np.zeros((economies, len(RARE_EVENT_TYPES) + 1), dtype=np.int64)
+        self.tick = 0
+        self.simulations = None  # The Simulations behind the rows, if any
+
+    @classmethod
+    def from_simulations(cls, simulations, seed=None):
+        """An ensemble over existing vectorized Simulations, which must share their rare event probabilities."""
+        simulations = list(simulations)
+        if not simulations:
+            raise ValueError("An ensemble needs at least one simulation")
+        rare_event_prob = simulations[0].rare_event_prob
+        for simulation in simulations:
+            if not simulation.vectorized:
+                raise ValueError("Only vectorized simulations can be stepped in an ensemble")
+            if simulation.events is not None or simulation.profiler is not None:
+                raise ValueError("The event log and the profiler are not fed for simulations in an ensemble")
+            if simulation.rare_event_prob != rare_event_prob:
+                raise ValueError("The simulations of an ensemble must share their rare event probabilities")
+        ensemble = cls(len(simulations), 0, seed, rare_event_prob)
+        ensemble.simulations = simulations
+        ensemble.gather()
+        return ensemble
+
+    @classmethod
+    def create(cls, economies, seed=None, **simulation_args):
+        """An ensemble of `economies` new Simulations built with `simulation_args`, each seeded from `seed`."""
+        seeds = [None] * economies if seed is None else np.random.SeedSequence(seed).generate_state(economies)
+        return cls.from_simulations([Simulation(seed=None if one is None else int(one), **simulation_args)
+                                     for one in seeds], seed)
+
+    @property
+    def economies(self):
+        return self.resource.shape[0]
+
+    def gather(self):
+        """Stack the simulations' balances and rare event state into the (K, N) arrays."""
+        populations = [simulation.population for simulation in self.simulations]
+        self.sizes = np.array([len(population) for population in populations])
+        shape = (len(populations), int(self.sizes.max()))
+        self.resource = np.zeros(shape)
+        self.currency = np.zeros(shape)
+        self.rare_event_type = np.zeros(shape, dtype=np.int8)
+        self.rare_event_counter = np.zeros(shape, dtype=np.int32)
+        for row, population in enumerate(populations):
+            size = len(population)
+            self.resource[row, :size] = population.resource
+            self.currency[row, :size] = population.currency
+            self.rare_event_type[row, :size] = population.rare_event_type
+            self.rare_event_counter[row, :size] = population.rare_event_counter
+
+    def _scatter(self, rows):
+        # Write the arrays back to the simulations in `rows`; returns their populations' old balances
+        before = {}
+        for row in rows:
+            population, size = self.simulations[row].population, self.sizes[row]
+            before[row] = population.resource.copy(), population.currency.copy()
+            population.resource[:] = self.resource[row, :size]
+            population.currency[:] = self.currency[row, :size]
+            population.rare_event_type[:] = self.rare_event_type[row, :size]
+            population.rare_event_counter[:] = self.rare_event_counter[row, :size]
+        return before
+
+    def sample_rare_events(self):
+        """
+        Sample one tick of the rare event chain for every economy.
+
+        Returns a mask of the economies whose crash check passed (the same
+        two draws as the per-tick check and sample_rare_event's own check)
+        and, for each economy, how many links of the chain occurred.
+        """
+        economies = self.economies
+        crash = self.rare_event_prob["crash"]
+        triggered = ((self.rng.random(economies) < crash) & (self.rng.random(economies) <= crash))
+        links = self.rng.random((economies, len(self.chain_prob))) <= self.chain_prob
+        depth = np.cumprod(links, axis=1).sum(axis=1)  # Links before the chain first breaks
+        return triggered, depth
+
+    def apply_rare_events(self, triggered, depth):
+        """Apply the cumulative reductions of sample_rare_events' outcome to every economy at once."""
+        hit = triggered & (depth > 0)
+        if hit.any():
+            factor = 1 - self.chain_reduction[depth[hit]][:, None]
+            self.resource[hit] = np.maximum(0, np.trunc(self.resource[hit] * factor))
+            self.currency[hit] = np.maximum(0, np.trunc(self.currency[hit] * factor))
+            self.rare_event_type[hit] = depth[hit][:, None]
+            self.rare_event_counter[hit] += 1
+            self.rare_event_total[hit] += 1
+
+        # Clear rare event types where the crash check passed but no event followed
+        self.rare_event_type[triggered & (depth == 0)] = 0
+        self.event_counts[triggered, depth[triggered]] += 1
+
+        if self.simulations is not None:
+            self._scatter(np.flatnonzero(triggered))
+            for row in np.flatnonzero(hit):
+                # Everyone was rescaled, as in Simulation.apply_rare_event
+                simulation = self.simulations[row]
+                simulation.rare_event_total += 1
+                simulation.totals.rebuild(simulation.population)
+                if simulation.analytics is not None:
+                    simulation.analytics.rebuild(simulation.population)
+
+    def redistribute(self):
+        """Anti-monopoly slash for every economy at once; returns the (K, N) mask of the players slashed."""
+        resource, currency = self.resource, self.currency
+        total_resources = resource.sum(axis=1, keepdims=True)
+        total_currency = currency.sum(axis=1, keepdims=True)
+        # Padding has no balance, so it is never a monopolist
+        monopolist = resource + currency > (total_resources - resource) + (total_currency - currency)
+        if monopolist.any():
+            resource[monopolist] = np.trunc(resource[monopolist] * 0.75)
+            currency[monopolist] = np.trunc(currency[monopolist] * 0.75)
+
+            if self.simulations is not None:
+                rows = np.flatnonzero(monopolist.any(axis=1))
+                before = self._scatter(rows)
+                for row in rows:
+                    simulation = self.simulations[row]
+                    slashed = np.flatnonzero(monopolist[row, :self.sizes[row]])
+                    resource_before, currency_before = before[row][0][slashed], before[row][1][slashed]
+                    simulation.totals.slashed(simulation.population, slashed, resource_before, currency_before)
+                    if simulation.analytics is not None:
+                        simulation.analytics.changed(simulation.population, slashed)
+        return monopolist
+
+    def step(self):
+        """One tick of the rare event and redistribution phases in every economy, and of the rest in each."""
+        if self.simulations is None:
+            self.apply_rare_events(*self.sample_rare_events())
+            self.redistribute()
+            self.tick += 1
+            return
+
+        for phase in self.simulations[0].PHASES:
+            if phase == 'rare_events':
+                self.gather()
+                self.apply_rare_events(*self.sample_rare_events())
+            elif phase == 'redistribute':
+                self.gather()
+                self.redistribute()
+            else:
+                for simulation in self.simulations:
+                    getattr(simulation, phase)()
+        for simulation in self.simulations:
+            simulation.finish_tick()
+        self.tick += 1
+
+    def run(self, ticks):
+        for _ in range(ticks):
+            self.step()
+
+    def event_frequencies(self):
+        """Fraction of ticks, per economy, on which each rare event chain ended at each link."""
+        return self.event_counts[:, 1:] / max(1, self.tick)
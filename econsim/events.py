@@ -0,0 +1,229 @@
+import json
+import os
+
+import numpy as np
+
+from .model import PERIOD_TICKS, RARE_EVENT_REDUCTIONS, RARE_EVENT_TYPES
+
+# Kinds of economic event, stored in the `kind` field of every record
+SPAWN, TRADE, INVEST, RETURN, RARE_EVENT, REDISTRIBUTE, REMOVE = range(7)
+EVENT_KINDS = ('spawn', 'trade', 'invest', 'return', 'rare_event', 'redistribute', 'remove')
+
+# One fixed-width (42 byte) record per event and player. `resource` and
+# `currency` are the changes to `agent`'s balances; a trade moves the same
+# amounts the other way for `other`, investments and returns keep the firm
+# index in `other`, and rare events keep the index of the last event of the
+# chain in `detail`.
+EVENT_DTYPE = np.dtype([
+    ('tick', np.int64),
+    ('agent', np.int64),
+    ('other', np.int64),
+    ('resource', np.float64),
+    ('currency', np.float64),
+    ('kind', np.uint8),
+    ('detail', np.int8),
+])
+
+LOG_FILE = "events.bin"
+META_FILE = "meta.json"
+INDEX_DIRECTORY = "index"
+FORMAT_VERSION = 1
+
+
+class EventLog:
+    """
+    Append-only binary log of every change to the players' balances.
+
+    Records (EVENT_DTYPE) are buffered and appended to `<directory>/events.bin`
+    whenever `flush_records` have piled up, on flush() and on close(). Every
+    `index_every` ticks, before the tick runs, the balances of all players
+    are saved as an index point (`index/<tick>.npz`) together with the number
+    of records written so far, so a Replay can start from the nearest one
+    instead of from tick 0.
+
+    Attach it with Simulation(events=...); it needs the vectorized path.
+    """
+
+    def __init__(self, directory, index_every=PERIOD_TICKS, flush_records=1 << 16):
+        self.directory = directory
+        self.index_every = index_every
+        self.flush_records = flush_records
+        os.makedirs(os.path.join(directory, INDEX_DIRECTORY), exist_ok=True)
+        for entry in os.listdir(os.path.join(directory, INDEX_DIRECTORY)):
+            os.remove(os.path.join(directory, INDEX_DIRECTORY, entry))  # Index points of an earlier log
+        with open(os.path.join(directory, META_FILE), "w") as file:
+            json.dump({"version": FORMAT_VERSION, "dtype": EVENT_DTYPE.descr, "index_every": index_every}, file)
+        self.file = open(os.path.join(directory, LOG_FILE), "wb")
+        self.pending = []
+        self.pending_records = 0
+        self.written = 0  # Records written or pending
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, kind, tick, agent, other=-1, resource=0, currency=0, detail=0):
+        """Append one record per entry of `agent`; the other fields broadcast against it."""
+        records = np.empty(len(agent), dtype=EVENT_DTYPE)
+        records['tick'] = tick
+        records['agent'] = agent
+        records['other'] = other
+        records['resource'] = resource
+        records['currency'] = currency
+        records['kind'] = kind
+        records['detail'] = detail
+        self.pending.append(records)
+        self.pending_records += len(records)
+        self.written += len(records)
+        if self.pending_records >= self.flush_records:
+            self.flush()
+
+    def begin_tick(self, simulation):
+        """Save an index point if one is due at the tick about to run."""
+        if simulation.tick % self.index_every == 0:
+            population = simulation.population
+            np.savez(os.path.join(self.directory, INDEX_DIRECTORY, f"{simulation.tick:012d}.npz"),
+                     offset=self.written, id=population.id, resource=population.resource,
+                     currency=population.currency)
+
+    def spawned(self, tick, population, index):
+        self.record(SPAWN, tick, population.id[index],
+                    resource=population.resource[index], currency=population.currency[index])
+
+    def traded(self, tick, population, i, j, resource_delta, currency_delta):
+        # resolve_trades' deltas are what `i` gives away
+        self.record(TRADE, tick, population.id[i], population.id[j], -resource_delta, -currency_delta)
+
+    def invested(self, tick, population, amount):
+        paid = np.flatnonzero(amount)
+        self.record(INVEST, tick, population.id[paid], population.firm[paid], resource=-amount[paid])
+
+    def returned(self, tick, population, returns):
+        paid = np.flatnonzero(returns)
+        self.record(RETURN, tick, population.id[paid], population.firm[paid], currency=returns[paid])
+
+    def scaled(self, kind, tick, population, index, resource_before, currency_before, detail=0):
+        """Rare events and redistribution: balances of `index` went from the `before` values to their current ones."""
+        self.record(kind, tick, population.id[index], resource=population.resource[index] - resource_before,
+                    currency=population.currency[index] - currency_before, detail=detail)
+
+    def removed(self, tick, ids):
+        self.record(REMOVE, tick, ids)
+
+    def flush(self):
+        if self.pending_records == 0:
+            return
+        self.file.write(np.concatenate(self.pending).tobytes())
+        self.file.flush()
+        self.pending.clear()
+        self.pending_records = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def _rare_event_factor(detail):
+    # Same cumulative sum, in the same order, as sample_rare_event
+    cumulative_reduction = 0
+    for event_name in RARE_EVENT_TYPES[:detail + 1]:
+        cumulative_reduction += RARE_EVENT_REDUCTIONS[event_name]
+    return 1 - cumulative_reduction
+
+
+class Replay:
+    """
+    Rebuilds player balances from an EventLog directory without re-running
+    the simulation.
+
+    The log is memory-mapped; balances(tick) starts from the last index point
+    at or before `tick` and applies the records in between, a batch of one
+    kind of event in one tick at a time. Additive events are replayed from
+    their deltas and rare events and redistribution with the simulation's
+    own formulas, so the balances come back bit for bit.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE)) as file:
+            meta = json.load(file)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported event log format {meta.get('version')!r} in {directory}")
+        self.index_every = meta["index_every"]
+        path = os.path.join(directory, LOG_FILE)
+        if os.path.getsize(path) >= EVENT_DTYPE.itemsize:
+            self.records = np.memmap(path, dtype=EVENT_DTYPE, mode='r',
+                                     shape=(os.path.getsize(path) // EVENT_DTYPE.itemsize,))
+        else:
+            self.records = np.empty(0, dtype=EVENT_DTYPE)
+        self.index_ticks = np.array(sorted(int(entry[:-4]) for entry in os.listdir(os.path.join(directory, INDEX_DIRECTORY))
+                                           if entry.endswith('.npz')), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.records)
+
+    def events(self, start_tick=0, end_tick=None):
+        """Records of ticks start_tick up to (not including) end_tick."""
+        ticks = self.records['tick']
+        start = np.searchsorted(ticks, start_tick, 'left')
+        end = len(ticks) if end_tick is None else np.searchsorted(ticks, end_tick, 'left')
+        return self.records[start:end]
+
+    def balances(self, tick):
+        """Player ids, resources and currencies at the start of `tick`, in id order."""
+        if len(self.index_ticks) == 0 or tick < self.index_ticks[0]:
+            raise ValueError(f"No index point at or before tick {tick} in {self.directory}")
+        start_tick = self.index_ticks[np.searchsorted(self.index_ticks, tick, 'right') - 1]
+        with np.load(os.path.join(self.directory, INDEX_DIRECTORY, f"{start_tick:012d}.npz")) as point:
+            offset = min(int(point['offset']), len(self.records))
+            ids, resource, currency = point['id'], point['resource'], point['currency']
+        end = offset + np.searchsorted(self.records['tick'][offset:], tick, 'left')
+        return self._apply(self.records[offset:end], ids, resource, currency)
+
+    def period(self, period, period_ticks=PERIOD_TICKS):
+        """Balances at the start of a time period, as logged for it in the CSV."""
+        return self.balances(period * period_ticks)
+
+    @staticmethod
+    def _apply(records, ids, resource, currency):
+        if len(records) == 0:
+            return ids, resource, currency
+        records = np.asarray(records)
+        ticks, kinds = records['tick'], records['kind']
+        starts = np.flatnonzero(np.r_[True, (ticks[1:] != ticks[:-1]) | (kinds[1:] != kinds[:-1])])
+        ends = np.r_[starts[1:], len(records)]
+
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            batch = records[start:end]
+            kind = batch['kind'][0]
+            if kind == SPAWN:
+                # Ids are handed out in increasing order, so appending keeps them sorted
+                ids = np.concatenate((ids, batch['agent']))
+                resource = np.concatenate((resource, batch['resource']))
+                currency = np.concatenate((currency, batch['currency']))
+                continue
+            if kind == REMOVE:
+                keep = ~np.isin(ids, batch['agent'])
+                ids, resource, currency = ids[keep], resource[keep], currency[keep]
+                continue
+
+            # Every player appears at most once in a batch, so fancy-index updates are safe
+            agent = np.searchsorted(ids, batch['agent'])
+            if kind == RARE_EVENT:
+                factor = _rare_event_factor(int(batch['detail'][0]))
+                resource[agent] = np.maximum(0, np.trunc(resource[agent] * factor))
+                currency[agent] = np.maximum(0, np.trunc(currency[agent] * factor))
+            elif kind == REDISTRIBUTE:
+                resource[agent] = np.trunc(resource[agent] * 0.75)
+                currency[agent] = np.trunc(currency[agent] * 0.75)
+            else:
+                resource[agent] += batch['resource']
+                currency[agent] += batch['currency']
+                if kind == TRADE:
+                    other = np.searchsorted(ids, batch['other'])
+                    resource[other] -= batch['resource']
+                    currency[other] -= batch['currency']
+        return ids, resource, currency
@@ -0,0 +1,55 @@
+import numpy as np
+
+from .model import Firm
+
+
+class Ledger:
+    """
+    Investment ledger between a Population and any number of firms.
+
+    Each player's chosen firm and outstanding investment live in the
+    population's `firm` and `investment` columns, indexed like every other
+    player attribute, so investing and paying out returns are array
+    operations over the population plus a bincount over the firms. Cost is
+    linear in players + firms; nothing is looked up by player id.
+    """
+
+    def __init__(self, firms):
+        self.firms = [firm if isinstance(firm, Firm) else Firm(firm) for firm in firms]
+        if not self.firms:
+            raise ValueError("A ledger needs at least one firm")
+
+    @property
+    def interest_rates(self):
+        return np.array([firm.interest_rate for firm in self.firms])
+
+    def choose_firms(self, population, index, rng):
+        """New players pick a firm uniformly at random (everyone uses firm 0 if there is only one)."""
+        if len(self.firms) > 1:
+            population.firm[index] = rng.integers(0, len(self.firms), len(index))
+
+    def invest(self, population, fraction=0.1):
+        """
+        Every player invests `fraction` of their resources in their firm
+        (Player.invest_resources). Returns the per-player amounts.
+        """
+        amount = population.resource * fraction
+        population.resource -= amount
+        population.investment += amount
+        reserves = np.bincount(population.firm, weights=amount, minlength=len(self.firms))
+        for firm, invested in zip(self.firms, reserves.tolist()):
+            firm.currency_reserves += invested
+        return amount
+
+    def settle(self, population):
+        """
+        Pay every investor their firm's interest on the outstanding investment
+        and clear it (Firm.process_returns). Returns the per-player returns.
+        """
+        returns = np.round(population.investment * self.interest_rates[population.firm])  # Profit only
+        population.currency += returns
+        population.investment[:] = 0
+        paid = np.bincount(population.firm, weights=returns, minlength=len(self.firms))
+        for firm, profit in zip(self.firms, paid.tolist()):
+            firm.currency_reserves -= profit  # Deduct the profit from firm’s reserves
+        return returns
@@ -0,0 +1,194 @@
+import random
+import logging
+import csv
+import os
+
+# Screen dimensions
+WIDTH, HEIGHT = 800, 600
+
+# Colors
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+STRATEGY_COLORS = {
+    "Perfect Substitutes": (255, 0, 0),  # Red
+    "Perfect Complements": (0, 255, 0),  # Green
+    "Cobb-Douglas": (0, 0, 255),        # Blue
+}
+
+# Game Constants
+STRATEGIES = list(STRATEGY_COLORS.keys())
+TRADE_RADIUS = 50
+TRADE_AMOUNT = 5
+NUM_PLAYERS = 10
+MIN_PLAYERS = 7
+FRAME_DELAY = 20  # milliseconds
+PERIOD_SECONDS = 5  # Length of one time period in the viewer
+PERIOD_TICKS = PERIOD_SECONDS * 1000 // FRAME_DELAY  # Ticks per time period (250)
+headers = ['Player', 'Strategy', 'Time Period', 'Resource', 'Currency', 
+           'Trade Count', 'Rare Event Occurred', 'Rare Event Type', 'Strategy Changed', 'Profit']
+
+RARE_EVENT_PROB = {
+    "crash": 0.1,  # P(Crash)
+    "recession_given_crash": 0.5,  # P(Recession | Crash)
+    "depression_given_recession": 0.20,  # P(Depression | Recession)
+    "fallout_given_depression": 0.10  # P(Economic Fallout | Depression)
+}
+
+class Firm:
+    def __init__(self, interest_rate=0.05):
+        self.interest_rate = interest_rate
+        self.currency_reserves = 0
+        self.investments = {}  # Tracks investments per player
+
+    def accept_investment(self, player_id, amount):
+        """Accepts an investment from a player."""
+        if player_id not in self.investments:
+            self.investments[player_id] = 0
+        self.investments[player_id] += amount
+        self.currency_reserves += amount
+
+    def process_returns(self):
+        """Calculates and returns investment returns to players."""
+        returns = {}
+        for player_id, invested_amount in self.investments.items():
+            profit = int(round(invested_amount * self.interest_rate))  # Calculate profit only
+            returns[player_id] = profit  # Only return the profit
+            self.currency_reserves -= profit  # Deduct the profit from firm’s reserves
+
+        self.investments.clear()
+        return returns
+
+# Simulation step for resource investment and returns
+def simulation_step(players, firms, elapsed_time, filename="game_data.csv"):
+    """Investments and returns for one time period; `firms` is a Firm or a list of them."""
+    if isinstance(firms, Firm):
+        firms = [firms]
+
+    # Players invest a portion of their resources in the firm they chose
+    for player in players:
+        player.invest_resources(firms[player.firm])  # Let the player decide how much to invest
+
+    # Firms process and distribute returns
+    players_by_id = {player.id: player for player in players}
+    for firm in firms:
+        for player_id, return_amount in firm.process_returns().items():
+            players_by_id[player_id].receive_returns(return_amount)
+
+    # After returns are processed, save the updated data (including profits/returns)
+    if filename is not None:
+        save_to_csv(players, elapsed_time, filename)  # Save to CSV after each return distribution
+
+def redistribute_resources(players):
+    total_resources = sum(player.resource for player in players)
+    total_currency = sum(player.currency for player in players)
+
+    for player in players:
+        other_players_resource = total_resources - player.resource
+        other_players_currency = total_currency - player.currency
+        
+        # Check if the player has more resources and currency combined than all others
+        if player.resource + player.currency > other_players_resource + other_players_currency:
+            # Slash the player's resources and currency to fit within average limits
+            player.resource = int(player.resource * 0.75)
+            player.currency = int(player.currency * 0.75)
+
+RARE_EVENT_REDUCTIONS = {
+    "Stock Market Crash": 0.15,
+    "Recession": 0.10,
+    "Depression": 0.05,
+    "Economic Fallout": 0.20,
+}
+RARE_EVENT_TYPES = list(RARE_EVENT_REDUCTIONS.keys())
+
+def rare_event_chain(probabilities=RARE_EVENT_PROB):
+    """(event name, conditional probability, reduction) for each link of the chain."""
+    return [
+        ("Stock Market Crash", probabilities["crash"], RARE_EVENT_REDUCTIONS["Stock Market Crash"]),
+        ("Recession", probabilities["recession_given_crash"], RARE_EVENT_REDUCTIONS["Recession"]),
+        ("Depression", probabilities["depression_given_recession"], RARE_EVENT_REDUCTIONS["Depression"]),
+        ("Economic Fallout", probabilities["fallout_given_depression"], RARE_EVENT_REDUCTIONS["Economic Fallout"])
+    ]
+
+def sample_rare_event(rng=random, probabilities=RARE_EVENT_PROB):
+    """
+    Walk the Stock Market Crash, Recession, Depression, Economic Fallout chain.
+    Returns None if the crash check fails, otherwise the last event reached
+    (None if the chain stopped at its first link) and the cumulative reduction.
+    """
+    if rng.random() > probabilities["crash"]:
+        return None
+
+    current_event = None
+    cumulative_reduction = 0  # Accumulated reduction from all events
+    for event_name, prob, reduction in rare_event_chain(probabilities):
+        if rng.random() <= prob:
+            current_event = event_name
+            cumulative_reduction += reduction
+            logging.info(f"{current_event} occurred! Total reduction: {cumulative_reduction * 100:.0f}%.")
+        else:
+            break  # Stop the chain if a condition fails
+    return current_event, cumulative_reduction
+
+def rare_event(players, elapsed_time, rng=random, probabilities=RARE_EVENT_PROB):
+    """
+    Simulate rare events using an event chain for Stock Market Crash, Recession, Depression, and Economic Fallout.
+    Apply reductions to resources and currency based on event type to all players.
+    Ensure the event affects only one time period.
+    Returns the final event of the chain, or None if no rare event occurred.
+    """
+    outcome = sample_rare_event(rng, probabilities)
+    if outcome is None:
+        return None
+    current_event, cumulative_reduction = outcome
+
+    # Apply the cumulative reduction to all players if any event occurred
+    if current_event is not None:
+        for player in players:
+            player.resource = max(0, int(player.resource * (1 - cumulative_reduction)))
+            player.currency = max(0, int(player.currency * (1 - cumulative_reduction)))
+
+            # Update player's rare event state to the last event in the chain
+            player.rare_event_type = current_event
+            player.rare_event_counter += 1
+    else:
+        # Clear rare event types for all players to ensure no lingering effects
+        for player in players:
+            player.rare_event_type = None
+
+    return current_event
+
+def clear_csv_on_exit(filename="game_data.csv"):
+    # Remove the CSV file to ensure it's overwritten when the program starts again
+    if os.path.exists(filename):
+        os.remove(filename)
+
+def save_to_csv(players, elapsed_time, filename="game_data.csv"):
+    headers = ['Player', 'Strategy', 'Time Period', 'Resource', 'Currency', 
+               'Trade Count', 'Rare Event Occurred', 'Rare Event Type', 'Strategy Changed', 'Profit']  # Correct header with 'Strategy Changed'
+
+    # Open the file in append mode ('a') to add data during each time period
+    with open(filename, mode='a', newline='') as file:
+        writer = csv.writer(file)
+
+        # Prepare headers only if the file is empty (initial run)
+        if os.stat(filename).st_size == 0:
+            writer.writerow(headers)
+
+        # Keep track of the unique entries for this time period
+        logged_players = set()  # Set to store players already logged for this time period
+
+        # Prepare data rows and write them to the CSV file
+        for i, player in enumerate(players):  # Use index `i` as unique player ID
+            if player.x not in logged_players:  # Use player position as a unique identifier
+                logged_players.add(player.x)  # Mark this player as logged for this time period
+                rare_event_occurred = 1 if player.rare_event_type else 0
+                rare_event_type = player.rare_event_type if player.rare_event_type else "None"
+                
+                # Add profit data (return from the firm)
+                profit = player.currency - (player.resource + player.trade_counter * player.trade_amount)  # Simplified calculation for profit
+                
+                # Construct row
+                row = [f"Player_{i}", player.strategy, elapsed_time, player.resource, 
+                       player.currency, player.trade_counter, rare_event_occurred, rare_event_type,
+                       1 if player.strategy != player.previous_strategy else 0, profit]  # Strategy Changed column
+                writer.writerow(row)
@@ -0,0 +1,511 @@
+import random
+import math
+
+import numpy as np
+
+from .model import (
+    WIDTH, HEIGHT, BLACK, STRATEGIES, STRATEGY_COLORS, TRADE_RADIUS, TRADE_AMOUNT, RARE_EVENT_TYPES,
+)
+from .spatial import pairs_within
+from .utility import choose_strategies, track_valuations, trade_ratios, valuation
+
+NO_RARE_EVENT = 0  # rare_event_type code for "no rare event"; event i of the chain is stored as i + 1
+
+
+class Population:
+    """
+    Player state stored as a structure of contiguous NumPy arrays.
+
+    Each attribute of a player is one array indexed by the player's position
+    in the population, strategies and rare event types are small integer
+    codes, and per-tick updates run as whole-array operations. Player objects
+    are thin views onto one index for code that works a player at a time.
+    """
+
+    FIELDS = {
+        'id': np.int64,
+        'x': np.int32,
+        'y': np.int32,
+        'dx': np.int32,
+        'dy': np.int32,
+        'resource': np.float64,
+        'currency': np.float64,
+        'cooldown': np.int32,
+        'trade_counter': np.int32,
+        'strategy': np.int8,
+        'previous_strategy': np.int8,
+        'rare_event_counter': np.int32,
+        'rare_event_type': np.int8,
+        'firm': np.int16,  # Index of the firm the player invests in
+        'investment': np.float64,  # Outstanding investment in that firm
+        'alpha': np.float64,  # Preference weight on resources, passed to the strategy's utility
+        # Memoized valuations and the balances, weight and strategy they were computed for
+        'valuation': np.float64,
+        'valued_resource': np.float64,
+        'valued_currency': np.float64,
+        'valued_alpha': np.float64,
+        'valued_strategy': np.int8,  # -1 until the first valuation
+    }
+    # Columns that do not start at zero, also used for checkpoints saved without them
+    DEFAULTS = {'alpha': 0.5, 'valued_strategy': -1}
+
+    def __init__(self, capacity=16, radius=10, trade_radius=TRADE_RADIUS, trade_amount=TRADE_AMOUNT):
+        if not trade_radius > 0:
+            # pairs_within bins players into cells of this size
+            raise ValueError(f"The trade radius must be positive, got {trade_radius}")
+        self.radius = radius
+        self.trade_radius = trade_radius
+        self.trade_amount = trade_amount
+        self.size = 0
+        self.next_id = 0  # Ids are never reused, so they stay stable across removals
+        self.capacity = max(1, capacity)
+        self._storage = {name: np.zeros(self.capacity, dtype=dtype) for name, dtype in self.FIELDS.items()}
+        self._bind()
+        track_valuations(self)
+
+    def _bind(self):
+        # Expose the live part of every column as an attribute (self.x, self.resource, ...)
+        for name, column in self._storage.items():
+            setattr(self, name, column[:self.size])
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(self.players())
+
+    def player(self, index):
+        return Player(self, index)
+
+    def players(self):
+        """Views onto every player, in index order."""
+        return [Player(self, index) for index in range(self.size)]
+
+    def _reserve(self, size):
+        if size <= self.capacity:
+            return
+        while self.capacity < size:
+            self.capacity *= 2
+        for name, column in self._storage.items():
+            grown = np.zeros(self.capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self._storage[name] = grown
+
+    def restore(self, columns, size, next_id):
+        """Replace every player with `size` rows from `columns` (a dict of arrays, e.g. memory-mapped)."""
+        self.size = 0
+        self._reserve(size)
+        for name, column in self._storage.items():
+            column[:size] = columns[name][:size] if name in columns else self.DEFAULTS.get(name, 0)
+        self.size = size
+        self.next_id = next_id
+        self._bind()
+
+    def spawn(self, count, rng, width=WIDTH, height=HEIGHT, margin=50):
+        """Append `count` new players at random positions at least `margin` from the edges."""
+        if count <= 0:
+            return
+        start, end = self.size, self.size + count
+        self._reserve(end)
+        self.size = end
+        self._bind()
+
+        new = slice(start, end)
+        self.id[new] = np.arange(self.next_id, self.next_id + count)
+        self.next_id += count
+        self.x[new] = rng.integers(margin, max(margin, width - margin) + 1, count)
+        self.y[new] = rng.integers(margin, max(margin, height - margin) + 1, count)
+        self.resource[new] = rng.integers(20, 51, count)
+        self.currency[new] = rng.integers(20, 51, count)
+        self.strategy[new] = rng.integers(0, len(STRATEGIES), count)
+        self.previous_strategy[new] = self.strategy[new]
+        self.dx[new] = rng.choice([-1, 1], count) * rng.integers(1, 4, count)
+        self.dy[new] = rng.choice([-1, 1], count) * rng.integers(1, 4, count)
+        for name in ('cooldown', 'trade_counter', 'rare_event_counter', 'rare_event_type', 'firm', 'investment',
+                     'alpha', 'valuation', 'valued_resource', 'valued_currency', 'valued_alpha', 'valued_strategy'):
+            getattr(self, name)[new] = self.DEFAULTS.get(name, 0)
+
+    def keep(self, mask):
+        """Drop every player whose entry in `mask` is False, preserving order."""
+        kept = int(np.count_nonzero(mask))
+        if kept == self.size:
+            return
+        for name, column in self._storage.items():
+            column[:kept] = column[:self.size][mask]
+        self.size = kept
+        self._bind()
+
+    def take(self, index):
+        """The players in `index` as a structured array of every column (RECORD_DTYPE)."""
+        records = np.empty(len(index), dtype=RECORD_DTYPE)
+        for name in self.FIELDS:
+            records[name] = getattr(self, name)[index]
+        return records
+
+    def put(self, index, records):
+        """Overwrite the players in `index` with `records`, as made by take()."""
+        for name in self.FIELDS:
+            getattr(self, name)[index] = records[name]
+
+    def append(self, records):
+        """Add the players in `records`, as made by take(), ids and all."""
+        if len(records) == 0:
+            return
+        start = self.size
+        self._reserve(start + len(records))
+        self.size = start + len(records)
+        self._bind()
+        self.put(slice(start, self.size), records)
+
+    @property
+    def collision_distance(self):
+        """How close two players must be to bounce: touching, and within trade radius (as in Player.move)."""
+        return min(2 * self.radius, self.trade_radius)
+
+    def move(self, rng, width=WIDTH, height=HEIGHT, bounced=None):
+        """
+        Array version of Player.move for every player at once.
+
+        Players within collision_distance bounce: velocity reversed with a
+        random nudge, clamped to [-3, 3], and a 10-tick cooldown. Unlike the
+        scalar loop, where a pair can bounce twice in one tick (once from
+        each side), every colliding player bounces exactly once. Collisions
+        are found before anyone moves, so a pair that closes in during the
+        tick trades before it bounces; the scalar loop already bounces about
+        half of those, when the later player checks the earlier one's new
+        position. That shows when the trade radius is within two player
+        radii. `bounced`, sorted indices, overrides the collision search (a
+        tile of ShardedSimulation also collides its players with its
+        neighbours').
+        """
+        x, y, dx, dy, cooldown = self.x, self.y, self.dx, self.dy, self.cooldown
+
+        if bounced is None:
+            i, j = pairs_within(x, y, self.collision_distance)
+            bounced = np.unique(np.concatenate((i, j)))
+        if len(bounced):
+            dx[bounced] = np.clip(-dx[bounced] + rng.integers(-1, 2, len(bounced)), -3, 3)
+            dy[bounced] = np.clip(-dy[bounced] + rng.integers(-1, 2, len(bounced)), -3, 3)
+            cooldown[bounced] = 10
+
+        # Update position
+        x += dx
+        y += dy
+
+        # Reflect off the screen edges
+        radius = self.radius
+        for position, velocity, limit in ((x, dx, width), (y, dy, height)):
+            low = position - radius < 0
+            position[low] = radius
+            velocity[low] = -velocity[low]
+            high = position + radius > limit
+            position[high] = limit - radius
+            velocity[high] = -velocity[high]
+
+        # Decrease cooldown timers
+        cooldown[cooldown > 0] -= 1
+
+    def active(self):
+        """Indices of the players off cooldown, the only ones who can trade this tick."""
+        return np.flatnonzero(self.cooldown == 0)
+
+    def trade_candidates(self):
+        """Pairs within trade radius where both players are off cooldown, in scalar loop order."""
+        # Only the active players are binned and searched; in a busy market most
+        # of them are cooling down. `active` is sorted, so the order carries over.
+        active = self.active()
+        i, j = pairs_within(self.x[active], self.y[active], self.trade_radius)
+        return active[i], active[j]
+
+    def apply_rare_event(self, current_event, cumulative_reduction):
+        """Array version of the reduction step of model.rare_event."""
+        if current_event is not None:
+            factor = 1 - cumulative_reduction
+            np.maximum(0, np.trunc(self.resource * factor), out=self.resource)
+            np.maximum(0, np.trunc(self.currency * factor), out=self.currency)
+            self.rare_event_type[:] = RARE_EVENT_TYPES.index(current_event) + 1
+            self.rare_event_counter += 1
+        else:
+            self.rare_event_type[:] = NO_RARE_EVENT
+
+    def redistribute(self):
+        """Array version of model.redistribute_resources; returns the indices of the players slashed."""
+        resource, currency = self.resource, self.currency
+        total_resources = resource.sum()
+        total_currency = currency.sum()
+        monopolist = resource + currency > (total_resources - resource) + (total_currency - currency)
+        if monopolist.any():
+            resource[monopolist] = np.trunc(resource[monopolist] * 0.75)
+            currency[monopolist] = np.trunc(currency[monopolist] * 0.75)
+        return np.flatnonzero(monopolist)
+
+    def valuations(self, index):
+        """
+        Array version of Player.evaluate_trade_ratio for the players in `index`.
+
+        Valuations are memoized per player and only recomputed for players
+        whose resource, currency, alpha or strategy changed since the last
+        call (or whose strategy's kernels were replaced), so an expensive
+        utility costs nothing for players who have not traded.
+        """
+        resource, currency, strategy = self.resource[index], self.currency[index], self.strategy[index]
+        alpha = self.alpha[index]
+        stale = ((self.valued_strategy[index] != strategy) | (self.valued_resource[index] != resource)
+                 | (self.valued_currency[index] != currency) | (self.valued_alpha[index] != alpha))
+        if stale.any():
+            update = index[stale]
+            self.valuation[update] = trade_ratios(resource[stale], currency[stale], strategy[stale], alpha[stale])
+            self.valued_resource[update] = resource[stale]
+            self.valued_currency[update] = currency[stale]
+            self.valued_alpha[update] = alpha[stale]
+            self.valued_strategy[update] = strategy[stale]
+        return self.valuation[index]
+
+    def invalidate_valuations(self, index=slice(None)):
+        """Recompute the valuations of the players in `index` (everyone by default) on next use."""
+        self.valued_strategy[index] = -1
+
+    def adjust_strategies(self, index):
+        """
+        Array version of Player.adjust_strategy for the players in `index`.
+        Returns the players whose strategy changed.
+        """
+        due = index[self.trade_counter[index] % 10 == 0]  # Adjust every 10 trades
+        strategy = choose_strategies(self.resource[due], self.currency[due])
+
+        changed = due[strategy != self.strategy[due]]
+        self.strategy[due] = strategy
+        self.previous_strategy[due] = strategy
+        return changed
+
+    def bankrupt(self):
+        """Mask of the players with no resources and currency."""
+        return (self.resource == 0) & (self.currency == 0)
+
+    def remove_bankrupt(self):
+        # Remove players with no resources and currency
+        self.keep(~self.bankrupt())
+
+
+# One player with every column, for moving players between populations
+RECORD_DTYPE = np.dtype(list(Population.FIELDS.items()))
+
+
+def _column(name, to_python):
+    def get(self):
+        return to_python(getattr(self.population, name)[self.index])
+
+    def set(self, value):
+        getattr(self.population, name)[self.index] = value
+
+    return property(get, set)
+
+
+def _code_column(name, names, offset=0):
+    def get(self):
+        code = int(getattr(self.population, name)[self.index]) - offset
+        return names[code] if code >= 0 else None
+
+    def set(self, value):
+        code = names.index(value) + offset if value is not None else 0
+        getattr(self.population, name)[self.index] = code
+
+    return property(get, set)
+
+
+class Player:
+    """View onto one player of a Population, with the original per-player logic."""
+
+    __slots__ = ('population', 'index')
+
+    def __init__(self, population, index):
+        self.population = population
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, Player) and self.population is other.population and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.population), self.index))
+
+    id = _column('id', int)
+    x = _column('x', int)
+    y = _column('y', int)
+    dx = _column('dx', int)
+    dy = _column('dy', int)
+    resource = _column('resource', float)
+    currency = _column('currency', float)
+    cooldown = _column('cooldown', int)
+    trade_counter = _column('trade_counter', int)
+    rare_event_counter = _column('rare_event_counter', int)
+    firm = _column('firm', int)
+    investment = _column('investment', float)
+    alpha = _column('alpha', float)
+    strategy = _code_column('strategy', STRATEGIES)
+    previous_strategy = _code_column('previous_strategy', STRATEGIES)
+    rare_event_type = _code_column('rare_event_type', RARE_EVENT_TYPES, offset=1)
+
+    @property
+    def radius(self):
+        return self.population.radius
+
+    @property
+    def scanning_radius(self):
+        return self.population.trade_radius
+
+    @property
+    def trade_amount(self):
+        return self.population.trade_amount
+
+    @property
+    def color(self):
+        return STRATEGY_COLORS[self.strategy]
+
+    def can_trade_with(self, other):
+        """Check if trade conditions are met with another player."""
+        # Add trade condition checks (for example, within trade radius)
+        distance = ((self.x - other.x) ** 2 + (self.y - other.y) ** 2) ** 0.5
+        return distance <= self.scanning_radius  # Example condition
+
+    def move(self, other_players=None, rng=random, width=WIDTH, height=HEIGHT):
+        """Update the player's position and handle interactions."""
+        if other_players is None:
+            other_players = []  # Default to an empty list
+
+        # Interact with other players and bounce upon trade
+        for other in other_players:
+            if other != self:  # Avoid self-interaction
+                distance = ((self.x - other.x) ** 2 + (self.y - other.y) ** 2) ** 0.5
+                if distance <= self.radius + other.radius:  # Collision or interaction
+                    if self.can_trade_with(other):  # Check if trade conditions are met
+                        # Move in the opposite direction after trade
+                        self.dx = -self.dx + rng.randint(-1, 1)  # Reverse and add randomness
+                        self.dy = -self.dy + rng.randint(-1, 1)  # Reverse and add randomness
+                        other.dx = -other.dx + rng.randint(-1, 1)  # Reverse and add randomness
+                        other.dy = -other.dy + rng.randint(-1, 1)  # Reverse and add randomness
+
+                        # Limit movement adjustments to avoid excessive speed
+                        self.dx = max(-3, min(3, self.dx))  # Limit to a range of -3 to 3
+                        self.dy = max(-3, min(3, self.dy))  # Limit to a range of -3 to 3
+                        other.dx = max(-3, min(3, other.dx))  # Limit to a range of -3 to 3
+                        other.dy = max(-3, min(3, other.dy))  # Limit to a range of -3 to 3
+
+                        # Cooldown to prevent immediate repeat interaction
+                        self.cooldown = 10
+                        other.cooldown = 10
+
+        # Update position
+        self.x += self.dx
+        self.y += self.dy
+
+        # Boundary checks to ensure players stay within screen bounds
+        if self.x - self.radius < 0:  # Left edge
+            self.x = self.radius  # Prevent going off-screen
+            self.dx = -self.dx  # Reverse direction
+        elif self.x + self.radius > width:  # Right edge
+            self.x = width - self.radius  # Prevent going off-screen
+            self.dx = -self.dx  # Reverse direction
+
+        if self.y - self.radius < 0:  # Top edge
+            self.y = self.radius  # Prevent going off-screen
+            self.dy = -self.dy  # Reverse direction
+        elif self.y + self.radius > height:  # Bottom edge
+            self.y = height - self.radius  # Prevent going off-screen
+            self.dy = -self.dy  # Reverse direction
+
+        # Decrease cooldown timer
+        if self.cooldown > 0:
+            self.cooldown -= 1
+
+
+    def evaluate_trade_ratio(self):
+        """Determine the trade ratio based on the player's strategy."""
+        # Each strategy's utility is registered in econsim.utility
+        return valuation(int(self.population.strategy[self.index]), self.resource, self.currency, self.alpha)
+
+    def trade(self, other):
+        if self.cooldown == 0 and other.cooldown == 0:
+            distance = math.sqrt((self.x - other.x) ** 2 + (self.y - other.y) ** 2)
+            if distance <= self.scanning_radius:
+                # Evaluate trade-off based on strategies
+                self_trade_ratio = self.evaluate_trade_ratio()
+                other_trade_ratio = other.evaluate_trade_ratio()
+
+                # Trade decision based on valuation alignment
+                if self_trade_ratio > other_trade_ratio:
+                    # Self values resources more; trade more resources for currency
+                    resource_trade = min(self.trade_amount, self.resource)
+                    currency_trade = min(self.trade_amount, other.currency)
+                    self.resource -= resource_trade
+                    self.currency += currency_trade
+                    other.resource += resource_trade
+                    other.currency -= currency_trade
+                elif self_trade_ratio < other_trade_ratio:
+                    # Self values currency more; trade more currency for resources
+                    resource_trade = min(self.trade_amount, other.resource)
+                    currency_trade = min(self.trade_amount, self.currency)
+                    self.resource += resource_trade
+                    self.currency -= currency_trade
+                    other.resource -= resource_trade
+                    other.currency += currency_trade
+                else:
+                    # Equal valuation; trade equal amounts
+                    resource_trade = min(self.trade_amount, self.resource, other.resource)
+                    currency_trade = min(self.trade_amount, self.currency, other.currency)
+                    self.resource -= resource_trade
+                    self.currency -= currency_trade
+                    other.resource += resource_trade
+                    other.currency += currency_trade
+
+                # Increment trade counters
+                self.trade_counter += 1  # Increment trade count for the player
+                other.trade_counter += 1  # Increment trade count for the other player
+
+                # Set cooldowns and increment trade counters
+                self.cooldown = 50
+                other.cooldown = 50
+                return True
+        return False
+    
+    def adjust_strategy(self, elapsed_time=0, sink=None):
+        """Adjust strategies based on recent trade success."""
+        previous_strategy = self.strategy  # Store the previous strategy before any changes
+
+        if self.trade_counter % 10 == 0:  # Adjust strategy at regular intervals (every 10 trades)
+            # The rule is pluggable, see econsim.utility.set_strategy_rule
+            code = choose_strategies(np.array([self.resource]), np.array([self.currency]))[0]
+            self.strategy = STRATEGIES[code]
+
+            # If the strategy has changed, record the change
+            if self.strategy != previous_strategy and sink is not None:
+                self.record_strategy_change(sink, elapsed_time)  # Only log the change if it's different
+
+            # Update previous_strategy to current strategy
+            self.previous_strategy = self.strategy
+
+    def record_strategy_change(self, sink, elapsed_time=0):
+        """Record the player's strategy change to a data sink."""
+        sink.write_strategy_changes(self.population, np.array([self.index]), elapsed_time)
+
+    def draw(self, screen, font):
+        import pygame  # The viewer is optional; headless runs never load pygame
+
+        pygame.draw.circle(screen, self.color, (self.x, self.y), self.radius)
+        label = f"R:{self.resource} C:{self.currency} S:{self.strategy[:2]}"
+        text = font.render(label, True, BLACK)
+        screen.blit(text, (self.x - self.radius, self.y - self.radius - 20))
+
+        trade_count_label = font.render(f"Trades: {self.trade_counter}", True, BLACK)
+        screen.blit(trade_count_label, (self.x - self.radius, self.y + self.radius))
+
+    def invest_resources(self, firm):
+        """Invest a portion of resources in the firm."""
+        invest_amount = self.resource * 0.1  # 10% of resources, as an example
+        if invest_amount <= self.resource:
+            self.resource -= invest_amount
+            firm.accept_investment(self.id, invest_amount)  # Pass amount directly to the firm
+
+    def receive_returns(self, amount):
+        """Receive returns from the firm."""
+        self.currency += amount
+
@@ -0,0 +1,127 @@
+"""Drawing helpers for the pygame viewer; importing this module needs pygame."""
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from .model import WHITE, BLACK, STRATEGIES, STRATEGY_COLORS
+
+LOD_THRESHOLD = 500  # Above this many players the viewer draws a density map instead of circles
+
+
+class LabelCache:
+    """
+    Rendered text surfaces keyed by text and color.
+
+    A label is only rasterised the first time its text shows up; after that
+    the same surface is blitted until the text changes. The least recently
+    used surfaces are dropped beyond `max_size` entries.
+    """
+
+    def __init__(self, font, max_size=4096):
+        self.font = font
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+
+    def get(self, text, color=BLACK):
+        key = (text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.font.render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_size:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+
+class DirtyRects:
+    """
+    Draws onto the screen while remembering which areas were touched, so a
+    frame only pushes the areas drawn this frame or the last one to the
+    display instead of flipping the whole window. Falls back to a full flip
+    when more than `max_rects` areas changed.
+    """
+
+    def __init__(self, screen, background=WHITE, max_rects=300):
+        self.screen = screen
+        self.background = background
+        self.max_rects = max_rects
+        self.previous = []
+        self.current = []
+        self.full = True  # The first frame always needs a full flip
+
+    def begin(self):
+        """Erase what the last frame drew."""
+        if self.full:
+            self.screen.fill(self.background)
+        else:
+            for rect in self.previous:
+                self.screen.fill(self.background, rect)
+
+    def blit(self, surface, position):
+        self.current.append(self.screen.blit(surface, position))
+
+    def circle(self, color, center, radius):
+        self.current.append(pygame.draw.circle(self.screen, color, center, radius))
+
+    def invalidate(self):
+        """Redraw and flip the whole window on the next frame."""
+        self.full = True
+
+    def present(self):
+        changed = self.previous + self.current
+        if self.full or len(changed) > self.max_rects:
+            pygame.display.flip()
+        else:
+            pygame.display.update(changed)
+        self.full = len(self.current) > self.max_rects  # Too many to erase one by one next frame
+        self.previous, self.current = self.current, []
+
+
+def draw_players(canvas, labels, population, scale=1.0):
+    """Circles and the two labels for every player, reading straight from the population arrays."""
+    radius = max(1, int(population.radius * scale))
+    # Looked up per frame, since strategies can be registered at any time (econsim.utility)
+    colors = [STRATEGY_COLORS[strategy] for strategy in STRATEGIES]
+    short_names = [strategy[:2] for strategy in STRATEGIES]
+    xs = (population.x * scale).astype(int).tolist()
+    ys = (population.y * scale).astype(int).tolist()
+    for x, y, strategy, resource, currency, trades in zip(
+            xs, ys, population.strategy.tolist(), population.resource.tolist(),
+            population.currency.tolist(), population.trade_counter.tolist()):
+        canvas.circle(colors[strategy], (x, y), radius)
+        canvas.blit(labels.get(f"R:{resource} C:{currency} S:{short_names[strategy]}"),
+                    (x - radius, y - radius - 20))
+        canvas.blit(labels.get(f"Trades: {trades}"), (x - radius, y + radius))
+
+
+def density_surface(population, world_size, screen_size, cell=2):
+    """
+    Level-of-detail view: a per-strategy density map of the whole population.
+
+    Players are binned into `cell`-pixel screen cells per strategy; each
+    strategy tints its cells towards its color in proportion to how many of
+    its players are there, so dense clusters read as solid color and a lone
+    player as a faint dot.
+    """
+    columns = max(1, screen_size[0] // cell)
+    rows = max(1, screen_size[1] // cell)
+    cx = np.clip((population.x * (columns / world_size[0])).astype(np.int64), 0, columns - 1)
+    cy = np.clip((population.y * (rows / world_size[1])).astype(np.int64), 0, rows - 1)
+    bins = cx * rows + cy  # Column-major, matching surfarray's (x, y) layout
+
+    image = np.full((columns * rows, 3), 255.0)
+    for code, color in enumerate(STRATEGY_COLORS[strategy] for strategy in STRATEGIES):
+        counts = np.bincount(bins[population.strategy == code], minlength=columns * rows)
+        if not counts.any():
+            continue
+        density = np.minimum(1.0, counts / max(1.0, np.percentile(counts[counts > 0], 90)))
+        image -= density[:, None] * (255 - np.array(color, dtype=np.float64))
+    image = np.clip(image, 0, 255).astype(np.uint8).reshape(columns, rows, 3)
+
+    surface = pygame.surfarray.make_surface(image)
+    if cell != 1:
+        surface = pygame.transform.scale(surface, (columns * cell, rows * cell))
+    return surface
@@ -0,0 +1,483 @@
+"""
+Spatially sharded simulation: the world is split into a grid of tiles, each
+owned by its own worker process, so one economy can use every core.
+
+    with ShardedSimulation(num_players=2_000_000, width=40000, height=30000, tiles=(4, 2)) as simulation:
+        simulation.run(2500)
+"""
+import logging
+import multiprocessing
+import random
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .ledger import Ledger
+from .model import (
+    WIDTH, HEIGHT, NUM_PLAYERS, MIN_PLAYERS, PERIOD_TICKS, RARE_EVENT_PROB, TRADE_RADIUS, TRADE_AMOUNT,
+    sample_rare_event,
+)
+from .population import Population, RECORD_DTYPE
+from .spatial import pairs_within
+from .trading import resolve_trades
+
+# A player handed to another tile, with the tile it goes to
+EXCHANGE_DTYPE = np.dtype(RECORD_DTYPE.descr + [('tile', np.int32)])
+_HEADER = 16  # Two int64 counts: emigrants, edge band
+
+
+def _copy(target, source, index=slice(None)):
+    # Field by field, since structured assignment between different dtypes goes by position
+    for name in RECORD_DTYPE.names:
+        target[name][index] = source[name]
+
+
+def _exchange_views(block, capacity):
+    # (counts, emigrants, band) arrays over one tile's exchange block
+    counts = np.ndarray(2, dtype=np.int64, buffer=block.buf)
+    emigrants = np.ndarray(capacity, dtype=EXCHANGE_DTYPE, buffer=block.buf, offset=_HEADER)
+    band = np.ndarray(capacity, dtype=EXCHANGE_DTYPE, buffer=block.buf, offset=_HEADER + capacity * EXCHANGE_DTYPE.itemsize)
+    return counts, emigrants, band
+
+
+class _Tile:
+    """
+    One tile's share of the economy, living in a worker process.
+
+    Each tile publishes, through its own shared memory block, the players
+    that left it this tick (for the neighbours to adopt) and its edge band:
+    ghost copies of every player within `halo` of an edge or corner it
+    shares with a neighbour. The neighbours bounce their players off the
+    ghosts and pair them up with their own for trading.
+
+    A pair across two tiles belongs to the tile with the lower index, which
+    trades it and writes the ghost back to the band it came from. Players in
+    such pairs are contested: they trade only in the waves, one per color of
+    a 2x2 coloring of the tiles, so that tiles trading at the same time
+    never share a neighbour's player. Everyone else trades beforehand, all
+    tiles at once.
+    """
+
+    def __init__(self, config, names):
+        self.index = config['index']
+        self.cols, self.rows = config['tiles']
+        self.col, self.row = self.index % self.cols, self.index // self.cols
+        self.x_edges, self.y_edges = config['x_edges'], config['y_edges']
+        self.x0, self.x1 = self.x_edges[self.col], self.x_edges[self.col + 1]
+        self.y0, self.y1 = self.y_edges[self.row], self.y_edges[self.row + 1]
+        self.width, self.height = config['width'], config['height']
+        self.trade_radius = config['trade_radius']
+        self.halo = config['halo']
+        self.capacity = config['capacity']
+        self.rng = np.random.default_rng(config['seed'])
+        self.ledger = Ledger(config['interest_rates'])
+        self.population = Population(capacity=config['players'], trade_radius=config['trade_radius'],
+                                     trade_amount=config['trade_amount'])
+
+        # Workers share the coordinator's resource tracker, which unlinks the blocks if it dies
+        self.blocks = [shared_memory.SharedMemory(name=name) for name in names]
+        self.exchange = [_exchange_views(block, self.capacity) for block in self.blocks]
+        self.around = [row * self.cols + col
+                       for row in range(max(0, self.row - 1), min(self.rows, self.row + 2))
+                       for col in range(max(0, self.col - 1), min(self.cols, self.col + 2))
+                       if (row, col) != (self.row, self.col)]
+        self.band = np.empty(0, dtype=np.intp)  # Indices of the players in the published band
+        self.contested = np.empty(0, dtype=np.intp)  # Those of them in a pair across tiles this tick
+
+    def detach(self):
+        self.exchange = []
+        for block in self.blocks:
+            block.close()
+
+    def tile_of(self, x, y):
+        col = np.clip(np.searchsorted(self.x_edges, x, 'right') - 1, 0, self.cols - 1)
+        row = np.clip(np.searchsorted(self.y_edges, y, 'right') - 1, 0, self.rows - 1)
+        return row * self.cols + col
+
+    def totals(self):
+        population = self.population
+        wealth = population.resource + population.currency
+        return (len(population), float(population.resource.sum()), float(population.currency.sum()),
+                float(wealth.max()) if len(population) else 0.0)
+
+    def _publish(self):
+        # Ghost copies of the players within `halo` of an edge shared with a neighbour
+        x, y = self.population.x, self.population.y
+        edge = np.zeros(len(x), dtype=bool)
+        if self.col > 0:
+            edge |= x < self.x0 + self.halo
+        if self.col < self.cols - 1:
+            edge |= x >= self.x1 - self.halo
+        if self.row > 0:
+            edge |= y < self.y0 + self.halo
+        if self.row < self.rows - 1:
+            edge |= y >= self.y1 - self.halo
+        self.band = np.flatnonzero(edge)
+        self.contested = np.empty(0, dtype=np.intp)
+        if len(self.band) > self.capacity:
+            # A player missing from the band could trade on both sides of the edge
+            raise RuntimeError(f"{len(self.band)} players near the edges of tile {self.index}, more than the "
+                               f"exchange capacity of {self.capacity}; pass a larger capacity")
+        counts, _, band = self.exchange[self.index]
+        _copy(band[:len(self.band)], self.population.take(self.band))
+        counts[1] = len(self.band)
+
+    def _pull(self):
+        # Take back the contested players, with the trades neighbours made with them
+        _, _, band = self.exchange[self.index]
+        self.population.put(self.contested, band[np.searchsorted(self.band, self.contested)])
+
+    def _ghosts(self):
+        """The neighbours' band players within `halo` of this tile, with the tile and slot each came from."""
+        records = [np.empty(0, dtype=EXCHANGE_DTYPE)]
+        tiles = [np.empty(0, dtype=np.intp)]
+        slots = [np.empty(0, dtype=np.intp)]
+        for tile in self.around:
+            counts, _, band = self.exchange[tile]
+            published = band[:counts[1]]
+            near = np.flatnonzero((published['x'] >= self.x0 - self.halo) & (published['x'] < self.x1 + self.halo)
+                                  & (published['y'] >= self.y0 - self.halo) & (published['y'] < self.y1 + self.halo))
+            records.append(published[near])
+            tiles.append(np.full(len(near), tile))
+            slots.append(near)
+        return np.concatenate(records), np.concatenate(tiles), np.concatenate(slots)
+
+    def spawn(self, count, next_id, margin):
+        population = self.population
+        # Players appear anywhere in the tile, but at least `margin` from the edges of the world
+        x0, x1 = max(self.x0, margin), min(self.x1, self.width - margin)
+        y0, y1 = max(self.y0, margin), min(self.y1, self.height - margin)
+        if x1 < x0:
+            x0, x1 = self.x0, self.x1
+        if y1 < y0:
+            y0, y1 = self.y0, self.y1
+        start = len(population)
+        population.next_id = next_id
+        population.spawn(count, self.rng, x1 - x0, y1 - y0, margin=0)
+        population.x[start:] += x0
+        population.y[start:] += y0
+        self.ledger.choose_firms(population, np.arange(start, len(population)), self.rng)
+        self._publish()
+        return self.totals()
+
+    def settle(self):
+        self.ledger.invest(self.population)
+        self.ledger.settle(self.population)
+        # Hand the change in every firm's reserves to the coordinator
+        reserves = [firm.currency_reserves for firm in self.ledger.firms]
+        for firm in self.ledger.firms:
+            firm.currency_reserves = 0
+        return reserves
+
+    def move(self):
+        population = self.population
+        # Bounce off every player in reach, the neighbours' ghosts (as published last tick) included
+        ghosts, _, _ = self._ghosts()
+        own = len(population)
+        i, j = pairs_within(np.concatenate((population.x, ghosts['x'])),
+                            np.concatenate((population.y, ghosts['y'])), population.collision_distance)
+        colliding = np.concatenate((i, j))
+        population.move(self.rng, self.width, self.height, bounced=np.unique(colliding[colliding < own]))
+
+        # Players who crossed into another tile (any that don't fit wait for the next tick)
+        counts, emigrants, _ = self.exchange[self.index]
+        tiles = self.tile_of(population.x, population.y)
+        leaving = np.flatnonzero(tiles != self.index)[:self.capacity]
+        _copy(emigrants[:len(leaving)], population.take(leaving))
+        emigrants['tile'][:len(leaving)] = tiles[leaving]
+        counts[0] = len(leaving)
+        if len(leaving):
+            staying = np.ones(len(population), dtype=bool)
+            staying[leaving] = False
+            population.keep(staying)
+
+    def arrive(self):
+        for tile in self.around:
+            counts, emigrants, _ = self.exchange[tile]
+            arriving = emigrants[:counts[0]]
+            self.population.append(arriving[arriving['tile'] == self.index])
+        self._publish()
+
+    def _candidates(self, ghosts):
+        # Pairs within trade radius of players off cooldown, ghosts numbered after the tile's own players
+        population = self.population
+        x = np.concatenate((population.x, ghosts['x']))
+        y = np.concatenate((population.y, ghosts['y']))
+        pool = np.flatnonzero(np.concatenate((population.cooldown, ghosts['cooldown'])) == 0)
+        i, j = pairs_within(x[pool], y[pool], self.trade_radius)
+        return pool[i], pool[j]
+
+    def trade(self):
+        """Trade the pairs away from every other tile, and find the contested players."""
+        population = self.population
+        ghosts, _, _ = self._ghosts()
+        own = len(population)
+        i, j = self._candidates(ghosts)
+        across = (i < own) != (j < own)
+        self.contested = np.unique(np.where(i[across] < own, i[across], j[across]))
+        inside = (i < own) & (j < own) & ~np.isin(i, self.contested) & ~np.isin(j, self.contested)
+        i, j, _, _ = resolve_trades(population, i[inside], j[inside])
+        population.adjust_strategies(np.concatenate((i, j)))
+        return len(i)
+
+    def wave(self):
+        """Trade the remaining pairs this tile owns: those inside it and those with higher-index tiles."""
+        population = self.population
+        self._pull()
+        ghosts, tiles, slots = self._ghosts()
+        own = len(population)
+        i, j = self._candidates(ghosts)
+        source = np.concatenate((np.full(own, self.index), tiles))
+        mine = np.minimum(source[i], source[j]) == self.index
+        population.append(ghosts)
+        i, j, _, _ = resolve_trades(population, i[mine], j[mine])
+        traded = np.concatenate((i, j))
+        population.adjust_strategies(traded)
+
+        # Write the results back: the tile's contested players to its band, ghosts to theirs
+        _, _, band = self.exchange[self.index]
+        _copy(band, population.take(self.contested), np.searchsorted(self.band, self.contested))
+        borrowed = traded[traded >= own] - own
+        for tile in np.unique(tiles[borrowed]):
+            ghost = borrowed[tiles[borrowed] == tile]
+            _copy(self.exchange[tile][2], population.take(own + ghost), slots[ghost])
+        population.keep(np.arange(len(population)) < own)
+        return len(i)
+
+    def finish(self, outcome):
+        population = self.population
+        self._pull()
+        population.remove_bankrupt()
+        if outcome is not None:
+            population.apply_rare_event(*outcome)
+        self._publish()
+        return self.totals()
+
+    def redistribute(self, total_resources, total_currency):
+        """model.redistribute_resources against the totals of the whole world."""
+        resource, currency = self.population.resource, self.population.currency
+        monopolist = resource + currency > (total_resources - resource) + (total_currency - currency)
+        resource[monopolist] = np.trunc(resource[monopolist] * 0.75)
+        currency[monopolist] = np.trunc(currency[monopolist] * 0.75)
+        return self.totals()
+
+    def gather(self):
+        return self.population.take(np.arange(len(self.population)))
+
+
+def _tile_worker(connection, config, names):
+    logging.getLogger().setLevel(logging.WARNING)
+    tile = None
+    try:
+        tile = _Tile(config, names)
+        while True:
+            command, args = connection.recv()
+            if command == 'close':
+                break
+            connection.send(('ok', getattr(tile, command)(*args)))
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+    finally:
+        if tile is not None:
+            tile.detach()
+        connection.close()
+
+
+class ShardedSimulation:
+    """
+    One economy split over a `tiles` = (columns, rows) grid, one worker
+    process per tile.
+
+    Every worker moves and trades the players in its tile. Players who walk
+    into another tile migrate to it, and ghost copies of the players near
+    every tile edge and corner are published to the neighbours each tick,
+    so players bounce off and trade with players across an edge as they
+    would within a tile; both go through one shared memory block per tile.
+    Each player still trades at most once per tick. The global phases are reduce and broadcast steps run from this process:
+    firm settlement (per-firm reserve changes are summed), the rare event
+    chain (sampled here, applied everywhere), respawning (new players are
+    spread over the tiles by area) and redistribution (against the summed
+    totals, only when the richest player could hold more than the rest).
+
+    Runs agree with Simulation in distribution, not bit for bit: the tiles
+    draw from independent random streams, and the pairs near an edge are
+    matched in a different order. Tiles must be at least two trade radii
+    wide and tall. Each tick costs up to eight round trips to the workers,
+    so it pays off from around a million players, where the work per tile
+    dwarfs them.
+    """
+
+    def __init__(self, num_players=NUM_PLAYERS, seed=None, width=WIDTH, height=HEIGHT, tiles=(2, 2),
+                 period_ticks=PERIOD_TICKS, min_players=MIN_PLAYERS, trade_radius=TRADE_RADIUS,
+                 trade_amount=TRADE_AMOUNT, interest_rate=0.05, rare_event_prob=None, firms=None, capacity=None):
+        cols, rows = tiles
+        self.x_edges = np.linspace(0, width, cols + 1).round().astype(np.int64)
+        self.y_edges = np.linspace(0, height, rows + 1).round().astype(np.int64)
+        # How far players reach across an edge, to trade and to bounce (players
+        # only bounce within trade radius, see Population.collision_distance)
+        halo = trade_radius
+        if min(np.diff(self.x_edges).min(), np.diff(self.y_edges).min()) < 2 * halo:
+            raise ValueError(f"Tiles of a {width}x{height} world split {cols}x{rows} are narrower than "
+                             f"{2 * halo}, twice the reach of a player")
+
+        self.tiles = (cols, rows)
+        self.width = width
+        self.height = height
+        self.period_ticks = period_ticks
+        self.min_players = min_players
+        self.rare_event_prob = dict(RARE_EVENT_PROB, **(rare_event_prob or {}))
+        self.rng = random.Random(seed)  # Rare event chain
+        seeds = np.random.SeedSequence(seed).spawn(cols * rows + 1)
+        self.np_rng = np.random.default_rng(seeds[-1])  # Where new players go
+        self.ledger = Ledger(firms if firms is not None else [interest_rate])
+
+        self.tick = 0
+        self.last_profit_time = 0
+        self.total_trades = 0
+        self.rare_event_total = 0
+        self.next_id = 0
+        self.size = 0
+        self.tile_totals = {}  # Last (players, resources, currency, richest) reported by each tile
+        self.area = np.outer(np.diff(self.y_edges), np.diff(self.x_edges)).ravel() / (width * height)
+
+        count = cols * rows
+        # Tiles of one color share no neighbours, so they can trade their contested players at once
+        colors = [(index // cols) % 2 * 2 + index % cols % 2 for index in range(count)]
+        self.waves = [[index for index in range(count) if colors[index] == color] for color in sorted(set(colors))]
+        per_tile = max(16, 2 * num_players // count)
+        if capacity is None:
+            # Room for several times the expected edge band
+            band = halo / min(np.diff(self.x_edges).min(), np.diff(self.y_edges).min())
+            capacity = int(8 * band * per_tile) + 1024
+        self.capacity = capacity
+        self.blocks = [shared_memory.SharedMemory(create=True, size=_HEADER + 2 * capacity * EXCHANGE_DTYPE.itemsize)
+                       for _ in range(count)]
+        names = [block.name for block in self.blocks]
+
+        self.connections = []
+        self.workers = []
+        for index in range(count):
+            config = {'index': index, 'tiles': self.tiles, 'x_edges': self.x_edges, 'y_edges': self.y_edges,
+                      'width': width, 'height': height, 'trade_radius': trade_radius, 'trade_amount': trade_amount,
+                      'halo': halo, 'capacity': capacity, 'seed': seeds[index], 'players': per_tile,
+                      'interest_rates': self.ledger.interest_rates.tolist()}
+            ours, theirs = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_tile_worker, args=(theirs, config, names), daemon=True)
+            worker.start()
+            theirs.close()
+            self.connections.append(ours)
+            self.workers.append(worker)
+
+        self.spawn(num_players, margin=100)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def firms(self):
+        return self.ledger.firms
+
+    @property
+    def elapsed_time(self):
+        return self.tick // self.period_ticks
+
+    def _send(self, index, command, *args):
+        self.connections[index].send((command, args))
+
+    def _receive(self, index):
+        status, value = self.connections[index].recv()
+        if status == 'error':
+            raise RuntimeError(f"Tile {index} failed:\n{value}")
+        return value
+
+    def _broadcast(self, command, *args):
+        # Every worker runs `command`; waiting for all of them is the barrier between phases
+        for index in range(len(self.connections)):
+            self._send(index, command, *args)
+        return [self._receive(index) for index in range(len(self.connections))]
+
+    def _reduce(self, totals):
+        self.size = sum(total[0] for total in totals)
+        self.total_resources = sum(total[1] for total in totals)
+        self.total_currency = sum(total[2] for total in totals)
+        self.max_wealth = max((total[3] for total in totals), default=0.0)
+
+    def spawn(self, count, margin=50):
+        """Add `count` players, spread over the tiles in proportion to their area."""
+        per_tile = self.np_rng.multinomial(count, self.area)
+        busy = np.flatnonzero(per_tile)
+        for index in busy:
+            self._send(index, 'spawn', int(per_tile[index]), self.next_id, margin)
+            self.next_id += int(per_tile[index])
+        for index in busy:
+            self.tile_totals[index] = self._receive(index)
+        self._reduce(list(self.tile_totals.values()))
+
+    def step(self):
+        """Advance the economy by one tick."""
+        elapsed_time = self.elapsed_time
+        if elapsed_time > self.last_profit_time:
+            for reserves in self._broadcast('settle'):
+                for firm, change in zip(self.firms, reserves):
+                    firm.currency_reserves += change
+            self.last_profit_time = elapsed_time
+
+        self._broadcast('move')
+        self._broadcast('arrive')
+        self.total_trades += sum(self._broadcast('trade'))
+        for wave in self.waves:
+            for index in wave:
+                self._send(index, 'wave')
+            self.total_trades += sum(self._receive(index) for index in wave)
+
+        outcome = None
+        if self.rng.random() < self.rare_event_prob["crash"]:
+            outcome = sample_rare_event(self.rng, self.rare_event_prob)
+            if outcome is not None and outcome[0] is not None:
+                self.rare_event_total += 1
+                logging.info(f"Rare event chain completed. Final event: {outcome[0]}. "
+                             f"Total rare events: {self.rare_event_total}.")
+        self.tile_totals = dict(enumerate(self._broadcast('finish', outcome)))
+        self._reduce(list(self.tile_totals.values()))
+
+        if self.size < self.min_players:
+            self.spawn(self.min_players - self.size)
+
+        # Nobody can hold more than everyone else combined without holding half of the total
+        if 2 * self.max_wealth > self.total_resources + self.total_currency:
+            self.tile_totals = dict(enumerate(self._broadcast('redistribute', self.total_resources,
+                                                              self.total_currency)))
+            self._reduce(list(self.tile_totals.values()))
+        self.tick += 1
+
+    def run(self, ticks):
+        for _ in range(ticks):
+            self.step()
+
+    def gather(self):
+        """Every player of every tile, as one structured array (RECORD_DTYPE) ordered by id."""
+        records = np.concatenate(self._broadcast('gather'))
+        return records[np.argsort(records['id'], kind='stable')]
+
+    def close(self):
+        """Stop the workers and free the shared memory."""
+        for connection in self.connections:
+            try:
+                connection.send(('close', ()))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.join(timeout=10)
+        for connection in self.connections:
+            connection.close()
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.connections, self.workers, self.blocks = [], [], []
@@ -0,0 +1,342 @@
+import random
+import logging
+
+import numpy as np
+
+from .aggregates import RunningTotals
+from .events import RARE_EVENT, REDISTRIBUTE
+from .model import (
+    WIDTH, HEIGHT, NUM_PLAYERS, MIN_PLAYERS, PERIOD_TICKS, RARE_EVENT_PROB, RARE_EVENT_TYPES, TRADE_RADIUS,
+    TRADE_AMOUNT,
+    simulation_step, redistribute_resources, rare_event, sample_rare_event,
+)
+from .ledger import Ledger
+from .population import Population
+from .sink import DataSink
+from .spatial import SpatialGrid
+from .trading import resolve_trades
+
+
+class Simulation:
+    """
+    Headless trade economy advanced on a logical tick counter.
+
+    One call to step() stands in for one frame of the original game loop; a
+    time period lasts `period_ticks` ticks instead of five wall-clock
+    seconds, so a run is only as slow as the CPU. The pygame viewer attaches
+    to an instance of this class and simply draws whatever state the last
+    step left behind.
+
+    The frame is not replayed exactly. The original loop took one player at
+    a time through move, trade with everyone and removal if bankrupt, so
+    later players moved after earlier ones had already traded. Here every
+    phase of PHASES runs over all players before the next one starts:
+    everyone moves, then every pair in range trades, then the bankrupt are
+    removed. And where the original added one player per frame while the
+    market was below `min_players`, respawn() tops it up to `min_players`
+    in one go. Both change the economy (who meets whom in a tick, and how
+    fast a crashed market refills); they are what lets the phases run as
+    whole-array operations, and both paths follow them.
+
+    Player state lives in a Population. With `vectorized` on (the default),
+    movement, trading, rare events and redistribution run as array
+    operations over the whole population. With it off,
+    every phase runs the original per-player methods on Player views, using
+    a SpatialGrid for neighbour queries; this is the reference path.
+    `spatial_index=False` makes it compare every pair of players instead,
+    like the original game loop, which gives the same results.
+
+    Players invest in one of `firms` (interest rates or Firm instances;
+    default a single firm at `interest_rate`), chosen at random when they
+    join, through a Ledger.
+
+    On the vectorized path `totals` keeps RunningTotals of the balances and
+    trades, so the trade count and the monopoly check in redistribute() do
+    not need a pass over the population every tick.
+
+    With an EventLog attached as `events` (vectorized path only), every
+    change to the players' balances is also recorded as it happens; with
+    Analytics attached as `analytics` (likewise), it is fed the same changes
+    and keeps streaming statistics of the wealth distribution.
+
+    The economic parameters (trade radius and amount, interest rates and
+    the rare event probabilities, merged over RARE_EVENT_PROB) are
+    per instance, and all randomness comes from generators seeded with
+    `seed`, so runs with different settings can share one process.
+    """
+
+    def __init__(self, num_players=NUM_PLAYERS, seed=None, width=WIDTH, height=HEIGHT,
+                 period_ticks=PERIOD_TICKS, min_players=MIN_PLAYERS, csv_filename=None,
+                 vectorized=True, sink=None, trade_radius=TRADE_RADIUS, trade_amount=TRADE_AMOUNT,
+                 interest_rate=0.05, rare_event_prob=None, firms=None, profiler=None, checkpointer=None,
+                 events=None, analytics=None, spatial_index=True):
+        if events is not None and not vectorized:
+            raise ValueError("The event log is only recorded on the vectorized path")
+        if analytics is not None and not vectorized:
+            raise ValueError("Analytics are only fed on the vectorized path")
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        self.period_ticks = period_ticks
+        self.min_players = min_players
+        # Where period rows and strategy changes go; None disables logging
+        self.sink = DataSink(csv_filename) if sink is None and csv_filename is not None else sink
+        self.vectorized = vectorized
+        self.profiler = profiler  # PhaseProfiler timing each phase, or None
+        self.checkpointer = checkpointer  # Checkpointer saving the state every so many ticks, or None
+        self.events = events  # EventLog recording every balance change, or None
+        self.analytics = analytics  # Analytics kept up to date with every balance change, or None
+        self.spatial_index = spatial_index
+        self.grid = SpatialGrid(trade_radius) if spatial_index and not vectorized else None
+        self.rare_event_prob = dict(RARE_EVENT_PROB, **(rare_event_prob or {}))
+
+        self.tick = 0
+        self.last_logged_time = 0  # Last time period written to the CSV
+        self.last_profit_time = 0  # Last time period the firm paid out
+        self.total_trades = 0
+        self.rare_event_total = 0
+        self.ledger = Ledger(firms if firms is not None else [interest_rate])
+        self.population = Population(capacity=num_players, trade_radius=trade_radius, trade_amount=trade_amount)
+        self.totals = RunningTotals(self.population) if vectorized else None
+        if analytics is not None:
+            analytics.rebuild(self.population)
+        self.spawn(num_players, margin=100)
+
+    @property
+    def firms(self):
+        return self.ledger.firms
+
+    @property
+    def firm(self):
+        """The first (by default the only) firm."""
+        return self.ledger.firms[0]
+
+    @property
+    def players(self):
+        """Player views onto the population, in index order."""
+        return self.population.players()
+
+    @property
+    def elapsed_time(self):
+        """Current time period (the viewer's 5-second interval counter)."""
+        return self.tick // self.period_ticks
+
+    def spawn(self, count, margin=50):
+        """Add `count` players at random positions at least `margin` from the edges."""
+        start = len(self.population)
+        self.population.spawn(count, self.np_rng, self.width, self.height, margin)
+        new = np.arange(start, len(self.population))
+        self.ledger.choose_firms(self.population, new, self.np_rng)
+        if self.totals is not None:
+            self.totals.spawned(self.population, new)
+        if self.analytics is not None:
+            self.analytics.spawned(self.population, new)
+        if self.events is not None:
+            self.events.spawned(self.tick, self.population, new)
+
+    def close(self):
+        """Flush and close the data sink, the event log and the profiler's report file."""
+        if self.sink is not None:
+            self.sink.close()
+        if self.events is not None:
+            self.events.close()
+        if self.analytics is not None:
+            self.analytics.close()
+        if self.profiler is not None:
+            self.profiler.close()
+
+    # One tick runs these methods in order
+    PHASES = ('log_period', 'settle_period', 'move_players', 'trade_players', 'remove_players',
+              'rare_events', 'respawn', 'redistribute')
+
+    def step(self):
+        """Advance the economy by one tick."""
+        profiler = self.profiler
+        if self.events is not None:
+            self.events.begin_tick(self)
+        if profiler is None:
+            for phase in self.PHASES:
+                getattr(self, phase)()
+        else:
+            for phase in self.PHASES:
+                with profiler.phase(phase):
+                    getattr(self, phase)()
+            profiler.end_tick()
+        self.finish_tick()
+
+    def finish_tick(self):
+        """Count the tick just run and let the analytics and checkpointer see it."""
+        self.tick += 1
+        if self.analytics is not None:
+            self.analytics.end_tick(self)
+        if self.checkpointer is not None:
+            self.checkpointer.after_tick(self)
+
+    def run(self, ticks):
+        """Advance the economy by `ticks` ticks as fast as possible."""
+        for _ in range(ticks):
+            self.step()
+
+    def log_period(self):
+        # Only log at the end of each time period, to avoid duplicates
+        elapsed_time = self.elapsed_time
+        if elapsed_time > self.last_logged_time:
+            if self.sink is not None:
+                self.sink.write_period(self.population, elapsed_time)
+            self.last_logged_time = elapsed_time
+
+    def settle_period(self):
+        # Update the simulation (Investments, Returns, etc.) once per time period
+        elapsed_time = self.elapsed_time
+        if elapsed_time > self.last_profit_time:
+            self.settle(elapsed_time)
+            if self.sink is not None:
+                # Log again once the returns are paid out
+                self.sink.write_period(self.population, elapsed_time)
+            self.last_profit_time = elapsed_time
+
+    def move_players(self):
+        if self.vectorized:
+            self.population.move(self.np_rng, self.width, self.height)
+            return
+
+        players = self.players
+        grid = self.grid
+        if grid is None:
+            for player in players:
+                player.move(players, self.rng, self.width, self.height)
+            return
+
+        grid.rebuild(players)
+        for index, player in enumerate(players):
+            player.move([players[other] for other in grid.neighbours(index)],
+                        self.rng, self.width, self.height)
+            grid.update(index, player)
+
+    def trade_players(self):
+        if self.vectorized:
+            i, j = self.population.trade_candidates()
+            i, j, resource_delta, currency_delta = resolve_trades(self.population, i, j)
+            if len(i) == 0:
+                return
+            self.total_trades += len(i)
+            self.totals.traded(self.population, i, j, resource_delta, currency_delta)
+            if self.events is not None:
+                self.events.traded(self.tick, self.population, i, j, resource_delta, currency_delta)
+
+            # Players adjust their strategy after trading
+            traded = np.concatenate((i, j))
+            previous = self.population.strategy[traded]
+            changed = self.population.adjust_strategies(traded)
+            if len(changed):
+                moved = self.population.strategy[traded] != previous
+                self.totals.restrategized(self.population, traded[moved], previous[moved])
+                if self.sink is not None:
+                    self.sink.write_strategy_changes(self.population, np.sort(changed), self.elapsed_time)
+            if self.analytics is not None:
+                self.analytics.changed(self.population, traded)
+            return
+
+        players = self.players
+        # A pair (j, i) with j < i has already been tried as (i, j) in the
+        # same phase, and a trade only ever makes it less eligible, so each
+        # pair only needs to be tried once, lowest index first.
+        for index, player in enumerate(players):
+            if player.cooldown:
+                continue  # Cannot trade with anyone this tick, so skip the neighbour query
+            candidates = range(len(players)) if self.grid is None else self.grid.neighbours(index)
+            for other in candidates:
+                if other > index and player.trade(players[other]):
+                    self.total_trades += 1  # Increment trade count when a trade occurs
+                    player.adjust_strategy(self.elapsed_time, self.sink)
+                    players[other].adjust_strategy(self.elapsed_time, self.sink)
+
+    def remove_players(self):
+        if not self.vectorized:
+            self.population.remove_bankrupt()
+            return
+
+        bankrupt = self.population.bankrupt()
+        if bankrupt.any():
+            index = np.flatnonzero(bankrupt)
+            self.totals.removing(self.population, index)
+            if self.analytics is not None:
+                self.analytics.removing(self.population, index)
+            if self.events is not None:
+                self.events.removed(self.tick, self.population.id[index])
+            self.population.keep(~bankrupt)
+
+    def rare_events(self):
+        if self.rng.random() < self.rare_event_prob["crash"]:
+            self.apply_rare_event(self.elapsed_time)
+
+    def respawn(self):
+        # Add new players if there are fewer than the minimum
+        if len(self.population) < self.min_players:
+            self.spawn(self.min_players - len(self.population))
+
+    def settle(self, elapsed_time):
+        """Players invest in their firm, which pays out its returns straight away."""
+        if self.vectorized:
+            amount = self.ledger.invest(self.population)
+            returns = self.ledger.settle(self.population)
+            self.totals.settled(self.population, amount, returns)
+            if self.analytics is not None:
+                self.analytics.settled(self.population, returns)
+            if self.events is not None:
+                self.events.invested(self.tick, self.population, amount)
+                self.events.returned(self.tick, self.population, returns)
+        else:
+            simulation_step(self.players, self.firms, elapsed_time, filename=None)
+
+    def apply_rare_event(self, elapsed_time):
+        if self.vectorized:
+            outcome = sample_rare_event(self.rng, self.rare_event_prob)
+            event = None
+            if outcome is not None:
+                event = outcome[0]
+                logged = self.events is not None and event is not None
+                if logged:
+                    before = self.population.resource.copy(), self.population.currency.copy()
+                self.population.apply_rare_event(*outcome)
+                if event is not None:
+                    # Everyone was rescaled
+                    self.totals.rebuild(self.population)
+                    if self.analytics is not None:
+                        self.analytics.rebuild(self.population)
+                if logged:
+                    self.events.scaled(RARE_EVENT, self.tick, self.population, slice(None), *before,
+                                       detail=RARE_EVENT_TYPES.index(event))
+        else:
+            event = rare_event(self.players, elapsed_time, self.rng, self.rare_event_prob)
+
+        if event is not None:
+            # Increment the rare event counter
+            self.rare_event_total += 1
+            logging.info(f"Rare event chain completed. Final event: {event}. Total rare events: {self.rare_event_total}.")
+        return event
+
+    def redistribute(self):
+        if self.vectorized:
+            # Nobody can hold more than everyone else combined without holding half of the total
+            if not self.totals.monopoly_possible(self.population):
+                return
+            before = self.population.resource.copy(), self.population.currency.copy()
+            slashed = self.population.redistribute()
+            if len(slashed):
+                resource_before, currency_before = before[0][slashed], before[1][slashed]
+                self.totals.slashed(self.population, slashed, resource_before, currency_before)
+                if self.analytics is not None:
+                    self.analytics.changed(self.population, slashed)
+                if self.events is not None:
+                    self.events.scaled(REDISTRIBUTE, self.tick, self.population, slashed,
+                                       resource_before, currency_before)
+        else:
+            redistribute_resources(self.players)
+
+    def trade_total(self):
+        """Number of trades made by the players currently in the market."""
+        if self.totals is not None:
+            return self.totals.total_trades
+        return int(self.population.trade_counter.sum())
@@ -0,0 +1,228 @@
+import csv
+import io
+import os
+
+import numpy as np
+
+from .model import STRATEGIES, RARE_EVENT_TYPES, headers
+
+# Column name and dtype of every field in `headers`, for the columnar sink.
+# Strategies and rare event types are stored as their integer codes.
+COLUMNS = {
+    'Player': np.int64,
+    'Strategy': np.int8,
+    'Time Period': np.int32,
+    'Resource': np.float64,
+    'Currency': np.float64,
+    'Trade Count': np.int32,
+    'Rare Event Occurred': np.int8,
+    'Rare Event Type': np.int8,
+    'Strategy Changed': np.int8,
+    'Profit': np.float64,
+}
+
+_RARE_EVENT_NAMES = np.array(["None"] + RARE_EVENT_TYPES, dtype=object)
+
+
+def player_columns(population, index, elapsed_time, strategy_changed=None):
+    """One `headers` row per player in `index`, as a dict of column arrays, keyed by player id."""
+    strategy = population.strategy[index]
+    rare_event_type = population.rare_event_type[index]
+    resource = population.resource[index]
+    currency = population.currency[index]
+    trade_counter = population.trade_counter[index]
+    if strategy_changed is None:
+        strategy_changed = strategy != population.previous_strategy[index]
+
+    return {
+        'Player': population.id[index],
+        'Strategy': strategy,
+        'Time Period': np.full(len(strategy), elapsed_time, dtype=np.int32),
+        'Resource': resource,
+        'Currency': currency,
+        'Trade Count': trade_counter,
+        'Rare Event Occurred': (rare_event_type != 0).astype(np.int8),
+        'Rare Event Type': rare_event_type,
+        'Strategy Changed': np.broadcast_to(np.asarray(strategy_changed, dtype=np.int8), len(strategy)),
+        # Add profit data (return from the firm)
+        'Profit': currency - (resource + trade_counter * population.trade_amount),  # Simplified calculation for profit
+    }
+
+
+class RowSink:
+    """
+    Base of the data sinks: subclasses write a dict of `headers` columns in
+    write_columns() and implement flush() and close(); the simulation's
+    period and strategy change rows are built here. Sinks that can be
+    resumed also implement position() and rewind(), which checkpoints use
+    to drop whatever was logged after them.
+    """
+
+    def position(self):
+        """Where the log written so far ends, as a JSON-able dict; None if the sink cannot be rewound."""
+        return None
+
+    def rewind(self, position):
+        """Drop everything logged after `position`, as returned by position()."""
+        raise NotImplementedError(f"{type(self).__name__} cannot be rewound")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_period(self, population, elapsed_time):
+        """Log every player at the end of a time period."""
+        self.write_columns(player_columns(population, np.arange(len(population)), elapsed_time))
+
+    def write_strategy_changes(self, population, index, elapsed_time):
+        """Log the players in `index`, who have just changed strategy."""
+        self.write_columns(player_columns(population, index, elapsed_time, strategy_changed=1))
+
+
+class DataSink(RowSink):
+    """
+    CSV writer for the `headers` schema that keeps its file open.
+
+    Rows are buffered in memory and written out in one call whenever
+    `flush_rows` rows or `flush_bytes` bytes have piled up, on flush(), and
+    on close(). The header row is written when the file starts out empty.
+    """
+
+    def __init__(self, filename='game_data.csv', mode='w', flush_rows=10000, flush_bytes=1 << 20):
+        self.filename = filename
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+        self.file = open(filename, mode, newline='')
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.pending_rows = 0
+        if self.file.tell() == 0:
+            self.write_rows([headers])
+
+    def write_rows(self, rows):
+        """Buffer already formatted rows."""
+        self.writer.writerows(rows)
+        self.pending_rows += len(rows)
+        if self.pending_rows >= self.flush_rows or self.buffer.tell() >= self.flush_bytes:
+            self.flush()
+
+    def write_columns(self, columns):
+        self.write_rows(list(zip(
+            [f"Player_{player}" for player in columns['Player'].tolist()],
+            np.array(STRATEGIES, dtype=object)[columns['Strategy']].tolist(),
+            columns['Time Period'].tolist(),
+            columns['Resource'].tolist(),
+            columns['Currency'].tolist(),
+            columns['Trade Count'].tolist(),
+            columns['Rare Event Occurred'].tolist(),
+            _RARE_EVENT_NAMES[columns['Rare Event Type']].tolist(),
+            columns['Strategy Changed'].tolist(),
+            columns['Profit'].tolist(),
+        )))
+
+    def position(self):
+        self.flush()
+        return {"bytes": self.file.tell()}
+
+    def rewind(self, position):
+        if "bytes" not in position:
+            raise ValueError(f"{self.filename} is a CSV log, but the position {position} is not a byte offset")
+        self.flush()
+        size = os.path.getsize(self.filename)
+        if position["bytes"] > size:
+            raise ValueError(f"{self.filename} holds {size} bytes, fewer than the {position['bytes']} logged "
+                             f"up to the checkpoint")
+        self.file.seek(position["bytes"])
+        self.file.truncate()
+
+    def flush(self):
+        if self.buffer.tell():
+            self.file.write(self.buffer.getvalue())
+            self.buffer.seek(0)
+            self.buffer.truncate()
+        self.pending_rows = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class ColumnarSink(RowSink):
+    """
+    Binary columnar writer for the `headers` schema.
+
+    Rows are buffered per column and written as one .npy file per column per
+    chunk (`<directory>/<column>.<chunk>.npy`), so millions of rows can be
+    loaded, or memory-mapped, with load_columnar() instead of parsed as CSV.
+    """
+
+    def __init__(self, directory, flush_rows=100000, flush_bytes=16 << 20):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.chunk = len(_chunk_files(directory, 'Player'))
+        self.pending = {name: [] for name in COLUMNS}
+        self.pending_rows = 0
+        self.pending_bytes = 0
+
+    def write_columns(self, columns):
+        for name, dtype in COLUMNS.items():
+            column = np.asarray(columns[name], dtype=dtype)
+            self.pending[name].append(column)
+            self.pending_bytes += column.nbytes
+        self.pending_rows += len(columns['Player'])
+        if self.pending_rows >= self.flush_rows or self.pending_bytes >= self.flush_bytes:
+            self.flush()
+
+    def position(self):
+        self.flush()
+        return {"chunks": self.chunk}
+
+    def rewind(self, position):
+        if "chunks" not in position:
+            raise ValueError(f"{self.directory} is a columnar log, but the position {position} is not a chunk count")
+        self.flush()
+        if position["chunks"] > self.chunk:
+            raise ValueError(f"{self.directory} holds {self.chunk} chunks, fewer than the {position['chunks']} "
+                             f"logged up to the checkpoint")
+        for name in COLUMNS:
+            for entry in _chunk_files(self.directory, name)[position["chunks"]:]:
+                os.remove(os.path.join(self.directory, entry))
+        self.chunk = position["chunks"]
+
+    def flush(self):
+        if self.pending_rows == 0:
+            return
+        for name, parts in self.pending.items():
+            np.save(os.path.join(self.directory, f"{name}.{self.chunk:06d}.npy"), np.concatenate(parts))
+            parts.clear()
+        self.chunk += 1
+        self.pending_rows = 0
+        self.pending_bytes = 0
+
+    def close(self):
+        self.flush()
+
+
+def _chunk_files(directory, name):
+    prefix = f"{name}."
+    return sorted(entry for entry in os.listdir(directory)
+                  if entry.startswith(prefix) and entry.endswith('.npy') and entry[len(prefix):-4].isdigit())
+
+
+def load_columnar(directory, mmap_mode='r'):
+    """Read back a ColumnarSink directory as a dict of column arrays."""
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        chunks = [np.load(os.path.join(directory, entry), mmap_mode=mmap_mode)
+                  for entry in _chunk_files(directory, name)]
+        if len(chunks) == 1:
+            columns[name] = chunks[0]
+        else:
+            columns[name] = np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+    return columns
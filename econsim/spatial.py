@@ -0,0 +1,113 @@
+from collections import defaultdict
+
+import numpy as np
+
+
+class SpatialGrid:
+    """
+    Uniform grid of square cells that buckets players by position.
+
+    Players are stored by their index in the players list. With the cell size
+    at least as large as the largest interaction distance (the trade radius),
+    every player that can collide or trade with a given player lies in that
+    player's own cell or one of the eight cells around it.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)  # (cx, cy) -> indices of players in that cell
+        self.keys = []  # Cell of each player, by index
+
+    def cell_of(self, x, y):
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def rebuild(self, players):
+        """Bucket every player from scratch."""
+        self.cells = defaultdict(list)
+        self.keys = []
+        for index, player in enumerate(players):
+            key = self.cell_of(player.x, player.y)
+            self.cells[key].append(index)
+            self.keys.append(key)
+
+    def update(self, index, player):
+        """Move one player to its new cell after it has moved."""
+        key = self.cell_of(player.x, player.y)
+        old_key = self.keys[index]
+        if key != old_key:
+            cell = self.cells[old_key]
+            cell.remove(index)
+            if not cell:
+                del self.cells[old_key]
+            self.cells[key].append(index)
+            self.keys[index] = key
+
+    def neighbours(self, index):
+        """Indices of the other players in the 3x3 block of cells around a player, in list order."""
+        cx, cy = self.keys[index]
+        found = []
+        for nx in (cx - 1, cx, cx + 1):
+            for ny in (cy - 1, cy, cy + 1):
+                cell = self.cells.get((nx, ny))
+                if cell:
+                    found.extend(cell)
+        found.remove(index)
+        found.sort()
+        return found
+
+
+# Half of the 3x3 neighbourhood; together with the cell itself every pair of
+# neighbouring cells is visited exactly once.
+_HALF_NEIGHBOURHOOD = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+def pairs_within(x, y, radius):
+    """
+    All index pairs (i, j), i < j, of points no further apart than `radius`.
+
+    The points are binned into a uniform grid of `radius`-sized cells by
+    sorting on cell id, and only the cell itself and its neighbours are
+    compared. Pairs come back sorted by i, then j, which is the order the
+    scalar loops visit them in.
+    """
+    n = len(x)
+    if n < 2:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    cx = np.floor_divide(x, radius).astype(np.int64)
+    cy = np.floor_divide(y, radius).astype(np.int64)
+    cx -= cx.min()
+    cy -= cy.min()
+    row = int(cx.max()) + 3  # Padding so neighbour offsets never wrap around a row
+    cell = (cy + 1) * row + (cx + 1)
+
+    order = np.argsort(cell, kind='stable')
+    sorted_cells = cell[order]
+    positions = np.arange(n)
+
+    # Work on sorted positions so every searchsorted query is itself sorted
+    found_i, found_j = [], []
+    for ox, oy in _HALF_NEIGHBOURHOOD:
+        target = sorted_cells + (oy * row + ox)
+        start = np.searchsorted(sorted_cells, target, 'left')
+        counts = np.searchsorted(sorted_cells, target, 'right') - start
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        p = np.repeat(positions, counts)
+        q = np.repeat(start, counts) + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+        if ox == 0 and oy == 0:
+            keep = p < q
+            p, q = p[keep], q[keep]
+        found_i.append(order[p])
+        found_j.append(order[q])
+
+    if not found_i:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    i = np.concatenate(found_i)
+    j = np.concatenate(found_j)
+    close = np.sqrt((x[i] - x[j]) ** 2.0 + (y[i] - y[j]) ** 2.0) <= radius
+    i, j = i[close], j[close]
+    low, high = np.minimum(i, j), np.maximum(i, j)
+    order = np.lexsort((high, low))
+    return low[order], high[order]
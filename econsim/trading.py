@@ -0,0 +1,92 @@
+import numpy as np
+
+
+MATCH_ROUNDS = 16  # Array rounds before match_pairs finishes the leftover pairs one by one
+
+
+def match_pairs(i, j):
+    """
+    Pick the pairs a sequential pass over (i, j) would trade, each player at most once.
+
+    Walking the pairs in order and taking every pair whose players are both
+    still free is inherently sequential, but it gives the same result as
+    repeatedly accepting every pair that comes first among the remaining
+    pairs of both of its players, which only takes a few array passes.
+    Returns a boolean mask over the pairs.
+
+    A round is only guaranteed to settle the first remaining pair, so a
+    chain of overlapping players numbered along it would take about one
+    round per two players. After MATCH_ROUNDS rounds the leftover pairs,
+    by then a short list, are walked sequentially instead.
+    """
+    accepted = np.zeros(len(i), dtype=bool)
+    if len(i) == 0:
+        return accepted
+
+    players, local = np.unique(np.concatenate((i, j)), return_inverse=True)
+    local_i, local_j = local[:len(i)], local[len(i):]
+    matched = np.zeros(len(players), dtype=bool)
+    remaining = np.arange(len(i))
+    for _ in range(MATCH_ROUNDS):
+        if len(remaining) == 0:
+            return accepted
+        first = np.full(len(players), len(i))
+        np.minimum.at(first, local_i[remaining], remaining)
+        np.minimum.at(first, local_j[remaining], remaining)
+        wins = remaining[(first[local_i[remaining]] == remaining) & (first[local_j[remaining]] == remaining)]
+        accepted[wins] = True
+        matched[local_i[wins]] = True
+        matched[local_j[wins]] = True
+        remaining = remaining[~(matched[local_i[remaining]] | matched[local_j[remaining]])]
+
+    # Every earlier pair of these players is settled, so the sequential pass can pick up from here
+    for pair, a, b in zip(remaining.tolist(), local_i[remaining].tolist(), local_j[remaining].tolist()):
+        if not (matched[a] or matched[b]):
+            accepted[pair] = True
+            matched[a] = matched[b] = True
+    return accepted
+
+
+def resolve_trades(population, i, j):
+    """
+    Batch trade phase: trade every pair a sequential pass of Player.trade over
+    (i, j) would, applying all transfers, counters and cooldowns as array
+    updates. Pairs must be in range and off cooldown, in the scalar loop's
+    order, as Population.trade_candidates returns them. Returns the two
+    sides (i, j) of the pairs that traded and the resource and currency
+    each `i` handed to its `j` (negative where it received).
+    """
+    accepted = match_pairs(i, j)
+    i, j = i[accepted], j[accepted]
+    if len(i) == 0:
+        return i, j, np.empty(0), np.empty(0)
+
+    resource, currency = population.resource, population.currency
+    trade_amount = population.trade_amount
+    self_ratio = population.valuations(i)
+    other_ratio = population.valuations(j)
+    sells = self_ratio > other_ratio  # Self values resources more; trade resources for currency
+    buys = self_ratio < other_ratio  # Self values currency more; trade currency for resources
+    equal = ~(sells | buys)  # Equal valuation; self hands over equal amounts
+
+    # Amount of resource and currency self gives away (negative when it receives)
+    resource_delta = np.empty(len(i))
+    currency_delta = np.empty(len(i))
+    resource_delta[sells] = np.minimum(trade_amount, resource[i[sells]])
+    currency_delta[sells] = -np.minimum(trade_amount, currency[j[sells]])
+    resource_delta[buys] = -np.minimum(trade_amount, resource[j[buys]])
+    currency_delta[buys] = np.minimum(trade_amount, currency[i[buys]])
+    resource_delta[equal] = np.minimum(trade_amount, np.minimum(resource[i[equal]], resource[j[equal]]))
+    currency_delta[equal] = np.minimum(trade_amount, np.minimum(currency[i[equal]], currency[j[equal]]))
+
+    # Every player appears at most once, so plain fancy-index updates are safe
+    resource[i] -= resource_delta
+    currency[i] -= currency_delta
+    resource[j] += resource_delta
+    currency[j] += currency_delta
+
+    population.trade_counter[i] += 1
+    population.trade_counter[j] += 1
+    population.cooldown[i] = 50
+    population.cooldown[j] = 50
+    return i, j, resource_delta, currency_delta
@@ -0,0 +1,183 @@
+"""
+Registry of preference types (strategies).
+
+Each strategy is a Utility: how a player values its resources and currency,
+as a scalar kernel for the per-player reference path and an array kernel
+for the vectorized one, both taking the player's preference weight `alpha`
+on resources. Strategies are identified by their position in STRATEGIES,
+which is also the code stored in Population.strategy, so new ones are
+appended and the built-in ones keep their codes.
+
+    from econsim.utility import register_utility, ces_utility
+    register_utility(ces_utility(rho=-1.0))  # before creating the simulation
+"""
+import weakref
+
+import numpy as np
+
+from .model import STRATEGIES, STRATEGY_COLORS
+
+
+class Utility:
+    """One preference type: its name, its color in the viewer and its two valuation kernels."""
+
+    def __init__(self, name, scalar, vectorized, color=(128, 128, 128)):
+        self.name = name
+        self.scalar = scalar  # (resource, currency, alpha) -> float
+        self.vectorized = vectorized  # (resource, currency, alpha) arrays -> array, same values as `scalar`
+        self.color = color
+
+    def __repr__(self):
+        return f"Utility({self.name!r})"
+
+
+def _substitutes(resource, currency, alpha):
+    # Linear trade-off: 1 unit of resource = 1 unit of currency
+    return resource / currency if currency != 0 else float('inf')
+
+
+def _substitutes_array(resource, currency, alpha):
+    values = np.full(len(resource), np.inf)
+    divisible = currency != 0
+    values[divisible] = resource[divisible] / currency[divisible]
+    return values
+
+
+def _complements(resource, currency, alpha):
+    # Complementary: utility based on the minimum of resource and currency
+    return min(resource, currency)
+
+
+def _complements_array(resource, currency, alpha):
+    return np.minimum(resource, currency)
+
+
+def _cobb_douglas(resource, currency, alpha):
+    # Cobb-Douglas utility function with weight alpha on resources
+    return (resource ** alpha) * (currency ** (1 - alpha))
+
+
+def _cobb_douglas_array(resource, currency, alpha):
+    # float_power goes through the C library's pow() like Python's ** does;
+    # np.power and np.sqrt round differently in the last bit for some inputs.
+    return np.float_power(resource, alpha) * np.float_power(currency, 1 - alpha)
+
+
+def ces_utility(name="CES", rho=0.5, color=(255, 165, 0)):
+    """
+    Constant elasticity of substitution, (alpha r^rho + (1 - alpha) c^rho)^(1/rho);
+    rho -> 1 approaches perfect substitutes, rho -> -inf perfect complements.
+    """
+    if rho == 0:
+        raise ValueError("rho = 0 is Cobb-Douglas; use the built-in strategy")
+
+    def scalar(resource, currency, alpha):
+        if rho < 0 and (resource == 0 or currency == 0):
+            return 0.0  # With rho < 0 an empty holding makes the whole bundle worthless
+        return (alpha * resource ** rho + (1 - alpha) * currency ** rho) ** (1 / rho)
+
+    def vectorized(resource, currency, alpha):
+        values = np.zeros(len(resource))
+        valid = (resource != 0) & (currency != 0) if rho < 0 else slice(None)
+        values[valid] = np.float_power(alpha[valid] * np.float_power(resource[valid], rho)
+                                       + (1 - alpha[valid]) * np.float_power(currency[valid], rho), 1 / rho)
+        return values
+
+    return Utility(name, scalar, vectorized, color)
+
+
+def leontief_utility(name="Weighted Leontief", color=(128, 0, 128)):
+    """Perfect complements in the proportion alpha : 1 - alpha, min(r / alpha, c / (1 - alpha)), for 0 < alpha < 1."""
+    def scalar(resource, currency, alpha):
+        return min(resource / alpha, currency / (1 - alpha))
+
+    def vectorized(resource, currency, alpha):
+        return np.minimum(resource / alpha, currency / (1 - alpha))
+
+    return Utility(name, scalar, vectorized, color)
+
+
+# Built-in strategies, in the order (and with the codes) of STRATEGIES
+UTILITIES = [
+    {
+        "Perfect Substitutes": Utility("Perfect Substitutes", _substitutes, _substitutes_array),
+        "Perfect Complements": Utility("Perfect Complements", _complements, _complements_array),
+        "Cobb-Douglas": Utility("Cobb-Douglas", _cobb_douglas, _cobb_douglas_array),
+    }[name]
+    for name in STRATEGIES
+]
+for _utility in UTILITIES:
+    _utility.color = STRATEGY_COLORS[_utility.name]
+STRATEGY_CODES = {strategy: code for code, strategy in enumerate(STRATEGIES)}
+_populations = weakref.WeakSet()  # Populations memoizing valuations, see track_valuations
+
+
+def register_utility(utility):
+    """
+    Add a strategy, or replace the kernels of one with the same name, and
+    return its code. STRATEGIES, STRATEGY_COLORS and STRATEGY_CODES are
+    updated in place; register before creating simulations, since players
+    spawn with a strategy drawn from all of them and per-strategy totals are
+    sized when a simulation starts.
+    """
+    code = STRATEGY_CODES.get(utility.name)
+    if code is None:
+        code = len(UTILITIES)
+        UTILITIES.append(utility)
+        STRATEGIES.append(utility.name)
+        STRATEGY_CODES[utility.name] = code
+    else:
+        UTILITIES[code] = utility
+        # Valuations memoized with the old kernels are stale
+        for population in list(_populations):
+            population.invalidate_valuations(population.valued_strategy == code)
+    STRATEGY_COLORS[utility.name] = utility.color
+    return code
+
+
+def track_valuations(population):
+    """Have register_utility() invalidate the valuations `population` memoized with replaced kernels."""
+    _populations.add(population)
+
+
+def valuation(strategy, resource, currency, alpha=0.5):
+    """Scalar valuation of one player with strategy code `strategy` (Player.evaluate_trade_ratio)."""
+    return UTILITIES[strategy].scalar(resource, currency, alpha)
+
+
+def trade_ratios(resource, currency, strategy, alpha=0.5):
+    """Array version of Player.evaluate_trade_ratio; `alpha` is one weight or one per player."""
+    ratios = np.ones(len(resource))  # Default for unknown strategies
+    alpha = np.broadcast_to(alpha, len(resource))
+    for code, utility in enumerate(UTILITIES):
+        chosen = strategy == code
+        if chosen.any():
+            ratios[chosen] = utility.vectorized(resource[chosen], currency[chosen], alpha[chosen])
+    return ratios
+
+
+def _resource_rule(resource, currency):
+    # Resource-rich players become perfect substitutes, currency-rich ones
+    # Cobb-Douglas, and evenly balanced ones perfect complements
+    strategy = np.full(len(resource), STRATEGY_CODES["Perfect Complements"], dtype=np.int8)
+    strategy[resource > currency] = STRATEGY_CODES["Perfect Substitutes"]
+    strategy[resource < currency] = STRATEGY_CODES["Cobb-Douglas"]
+    return strategy
+
+
+_strategy_rule = _resource_rule
+
+
+def set_strategy_rule(rule):
+    """
+    Replace the rule players re-pick their strategy by after every 10th
+    trade: rule(resource, currency) arrays -> strategy codes. None restores
+    the default.
+    """
+    global _strategy_rule
+    _strategy_rule = rule if rule is not None else _resource_rule
+
+
+def choose_strategies(resource, currency):
+    """Strategy codes the current rule assigns to these balances."""
+    return _strategy_rule(resource, currency)
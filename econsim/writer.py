@@ -0,0 +1,122 @@
+import logging
+import queue
+import threading
+
+import numpy as np
+
+from .sink import COLUMNS, RowSink
+
+POLICIES = ('block', 'drop', 'coalesce')
+
+_STOP = object()  # Tells the writer thread to exit
+
+
+def _freeze(columns):
+    """Copy of a column dict that neither side can modify afterwards."""
+    frozen = {}
+    for name, column in columns.items():
+        column = np.array(column, dtype=COLUMNS[name])
+        column.flags.writeable = False
+        frozen[name] = column
+    return frozen
+
+
+def _concatenate(snapshots):
+    return {name: np.concatenate([snapshot[name] for snapshot in snapshots]) for name in COLUMNS}
+
+
+class AsyncSink(RowSink):
+    """
+    Wraps a DataSink or ColumnarSink so writes happen on a background thread.
+
+    The simulation thread only copies the rows it logs into an immutable
+    snapshot and puts it on a bounded queue; a dedicated writer thread
+    formats and writes them. When the queue is full, `policy` decides:
+
+    - 'block': wait for the writer to catch up (no rows lost);
+    - 'drop': discard the snapshot and count it in `dropped_rows`;
+    - 'coalesce': keep it and merge it with any later snapshots into a
+      single queue entry once there is room (no rows lost, never waits).
+
+    close() (the viewer calls it on pygame.QUIT) drains the queue, stops the
+    thread and closes the wrapped sink.
+    """
+
+    def __init__(self, sink, maxsize=64, policy='block'):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r}, expected one of {POLICIES}")
+        self.sink = sink
+        self.policy = policy
+        self.queue = queue.Queue(maxsize)
+        self.backlog = []  # Snapshots waiting for room in the queue ('coalesce')
+        self.dropped_rows = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="econsim-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            snapshot = self.queue.get()
+            try:
+                if snapshot is _STOP:
+                    return
+                if self.error is None:
+                    self.sink.write_columns(snapshot)
+            except Exception as error:
+                logging.exception("Writer thread failed; further rows are discarded.")
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError("The writer thread failed") from self.error
+
+    def write_columns(self, columns):
+        self._check()
+        snapshot = _freeze(columns)
+        if self.policy == 'block':
+            self.queue.put(snapshot)
+        elif self.policy == 'drop':
+            try:
+                self.queue.put_nowait(snapshot)
+            except queue.Full:
+                self.dropped_rows += len(snapshot['Player'])
+        else:
+            self.backlog.append(snapshot)
+            if self.queue.full():
+                return  # Merge only once there is room, so a long backlog isn't copied on every write
+            merged = self.backlog[0] if len(self.backlog) == 1 else _concatenate(self.backlog)
+            try:
+                self.queue.put_nowait(merged)
+            except queue.Full:
+                self.backlog = [merged]  # Keep the merge for next time rather than redoing it
+                return
+            self.backlog = []
+
+    def flush(self):
+        """Wait until every snapshot so far is written, then flush the wrapped sink."""
+        if self.backlog:
+            self.queue.put(_concatenate(self.backlog))
+            self.backlog = []
+        self.queue.join()
+        self._check()
+        self.sink.flush()
+
+    def position(self):
+        self.flush()
+        return self.sink.position()
+
+    def rewind(self, position):
+        self.flush()
+        self.sink.rewind(position)
+
+    def close(self):
+        if not self.thread.is_alive():
+            return
+        try:
+            self.flush()
+        finally:
+            self.queue.put(_STOP)
+            self.thread.join()
+            self.sink.close()